@@ -0,0 +1,16 @@
+"""Synthetic app driven by the websocket benchmark, streams a fixed answer."""
+import os
+
+import chainlit as cl
+
+TOKENS = int(os.environ.get("BENCHMARK_TOKENS", "50"))
+TOKEN_SIZE = int(os.environ.get("BENCHMARK_TOKEN_SIZE", "4"))
+
+
+@cl.on_message
+async def main(content: str, message_id: str):
+    msg = cl.Message(content="")
+    token = "x" * (TOKEN_SIZE - 1) + " "
+    for _ in range(TOKENS):
+        await msg.stream_token(token)
+    await msg.send()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+import pytest
+
+# Keep the .chainlit directory and the activity log out of the repository,
+# chainlit reads its config from the working directory when imported
+_work_dir = tempfile.mkdtemp(prefix="chainlit-benchmark-")
+os.environ.setdefault(
+    "ONEPOINT_SQL_LITE_DB", os.path.join(_work_dir, "activity_log.db")
+)
+os.chdir(_work_dir)
+
+from chainlit import telemetry  # noqa: E402
+from chainlit.prompt import Prompt, PromptMessage  # noqa: E402
+
+# Realistic sizes of a chat answer and of a prompt playground prompt
+CONTENT_SIZE = 2 * 1024
+PROMPT_MESSAGES = 20
+
+
+@pytest.fixture(autouse=True)
+def disable_telemetry(monkeypatch):
+    monkeypatch.setattr(telemetry.chainlit_telemetry, "enabled", False)
+
+
+@pytest.fixture
+def content() -> str:
+    paragraph = "Chainlit streams **markdown** answers with `code` and [links](https://chainlit.io).\n"
+    return (paragraph * (CONTENT_SIZE // len(paragraph) + 1))[:CONTENT_SIZE]
+
+
+@pytest.fixture
+def prompt(content: str) -> Prompt:
+    roles = ["system", "user", "assistant"]
+    return Prompt(
+        provider="openai-chat",
+        inputs={"question": "What is Chainlit?", "context": content},
+        settings={
+            "model": "gpt-3.5-turbo",
+            "temperature": 0.7,
+            "max_tokens": 256,
+            "stop": ["\n\n"],
+        },
+        messages=[
+            PromptMessage(
+                template="{context}\n\n{question}" if i == 1 else None,
+                formatted=content[:256],
+                role=roles[i % len(roles)],  # type: ignore
+            )
+            for i in range(PROMPT_MESSAGES)
+        ],
+        completion=content[:512],
+    )
@@ -0,0 +1,89 @@
+"""
+Microbenchmarks of the data model hot paths, run for every message and token.
+
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare
+"""
+import pytest
+from chainlit import telemetry
+from chainlit.element import Image, Text
+from chainlit.message import Message
+from chainlit.prompt import Prompt
+from chainlit.telemetry import ChainlitTelemetry, trace_event
+
+
+@pytest.fixture
+def message(content, prompt) -> Message:
+    return Message(content=content, author="Assistant", prompt=prompt)
+
+
+@pytest.fixture
+def message_dict(message) -> dict:
+    return message.to_dict()
+
+
+class InMemoryTelemetry(ChainlitTelemetry):
+    """Keep the spans in memory instead of exporting them."""
+
+    def _configure(self):
+        from opentelemetry.sdk.trace import TracerProvider
+
+        self._tracer = TracerProvider().get_tracer("chainlit-benchmark")
+
+
+@pytest.fixture
+def in_memory_telemetry(monkeypatch):
+    monkeypatch.setattr(
+        telemetry, "chainlit_telemetry", InMemoryTelemetry(enabled=True)
+    )
+
+
+def test_message_init(benchmark, content):
+    benchmark(Message, content=content, author="Assistant")
+
+
+def test_message_to_dict(benchmark, content):
+    message = Message(content=content, author="Assistant")
+    benchmark(message.to_dict)
+
+
+def test_message_with_prompt_to_dict(benchmark, message):
+    benchmark(message.to_dict)
+
+
+def test_message_from_dict(benchmark, message_dict):
+    benchmark(Message.from_dict, message_dict)
+
+
+def test_text_element_to_dict(benchmark, content):
+    element = Text(name="answer", content=content, for_ids=["message-id"])
+    benchmark(element.to_dict)
+
+
+def test_image_element_init(benchmark):
+    benchmark(Image, name="chart", url="https://chainlit.io/chart.png")
+
+
+def test_prompt_to_dict(benchmark, prompt):
+    benchmark(prompt.to_dict)
+
+
+def test_prompt_from_dict(benchmark, prompt):
+    prompt_dict = prompt.to_dict()
+    benchmark(Prompt.from_dict, prompt_dict)
+
+
+def test_trace_event_disabled(benchmark):
+    benchmark(trace_event, "init", "Message")
+
+
+def test_trace_event_enabled(benchmark, in_memory_telemetry):
+    benchmark(trace_event, "init", "Message")
+
+
+def test_message_init_with_telemetry(benchmark, content, in_memory_telemetry):
+    benchmark(Message, content=content, author="Assistant")
+
+
+def test_trace_decorator_with_telemetry(benchmark, in_memory_telemetry):
+    benchmark(telemetry.trace(lambda: None))
@@ -0,0 +1,349 @@
+"""
+Websocket round-trip benchmark.
+
+Serves the real FastAPI + socket.io app in-process with the synthetic
+`on_message` handler of app.py, and drives concurrent socket.io clients
+sending `ui_message` events and consuming the streamed tokens.
+
+    python benchmarks/websocket_roundtrip.py --clients 20 --messages 50 --output result.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else None,
+        "max": max(values) if values else None,
+    }
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def thread_cpu_time(thread: threading.Thread) -> Optional[float]:
+    """CPU time of another thread, None if the platform cannot tell."""
+    try:
+        clock_id = time.pthread_getcpuclockid(thread.ident)  # type: ignore
+        return time.clock_gettime(clock_id)
+    except (AttributeError, OSError, TypeError):
+        return None
+
+
+class Server:
+    """The chainlit app served by uvicorn in a background thread."""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from chainlit.server import app, max_message_size
+
+        self.port = port
+        # The lifespan opens a browser, watches files and exits the process
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                app,
+                host="127.0.0.1",
+                port=port,
+                lifespan="off",
+                log_level="error",
+                ws_max_size=max_message_size,
+            )
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("The benchmark server failed to start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+    def cpu_time(self) -> Optional[float]:
+        return thread_cpu_time(self.thread)
+
+
+async def run_client(url: str, messages: int, timeout: float, results: Dict):
+    import socketio
+
+    client = socketio.AsyncClient(reconnection=False)
+    done = asyncio.Event()
+    state = {"tokens": 0, "first_token_at": None}
+
+    @client.on("stream_token")
+    async def on_token(data):
+        if state["first_token_at"] is None:
+            state["first_token_at"] = time.perf_counter()
+        state["tokens"] += 1
+
+    @client.on("task_end")
+    async def on_task_end(data):
+        done.set()
+
+    await client.connect(
+        url,
+        headers={"X-Chainlit-Session-Id": str(uuid.uuid4())},
+        transports=["websocket"],
+        socketio_path="/ws/socket.io",
+    )
+    await client.emit("connection_successful")
+
+    try:
+        for i in range(messages):
+            done.clear()
+            state["tokens"] = 0
+            state["first_token_at"] = None
+
+            sent_at = time.perf_counter()
+            await client.emit(
+                "ui_message",
+                {
+                    "id": str(uuid.uuid4()),
+                    "author": "User",
+                    "content": f"Benchmark message {i}",
+                    "createdAt": datetime.now(timezone.utc).isoformat(),
+                    "authorIsUser": True,
+                },
+            )
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                results["timeouts"] += 1
+                continue
+            ended_at = time.perf_counter()
+
+            results["latencies"].append((ended_at - sent_at) * 1000)
+            if state["first_token_at"] is not None:
+                results["first_token_latencies"].append(
+                    (state["first_token_at"] - sent_at) * 1000
+                )
+            results["tokens"] += state["tokens"]
+    finally:
+        await client.disconnect()
+
+
+async def run_clients(url: str, args) -> Dict:
+    results = {
+        "latencies": [],
+        "first_token_latencies": [],
+        "tokens": 0,
+        "timeouts": 0,
+    }  # type: Dict
+    await asyncio.gather(
+        *[
+            run_client(url, args.messages, args.timeout, results)
+            for _ in range(args.clients)
+        ]
+    )
+    return results
+
+
+def run_benchmark(args) -> Dict:
+    os.environ["BENCHMARK_TOKENS"] = str(args.tokens)
+    os.environ["BENCHMARK_TOKEN_SIZE"] = str(args.token_size)
+
+    # Keep the .chainlit directory and the activity log out of the repository
+    work_dir = tempfile.mkdtemp(prefix="chainlit-benchmark-")
+    os.environ.setdefault(
+        "ONEPOINT_SQL_LITE_DB", os.path.join(work_dir, "activity_log.db")
+    )
+    os.chdir(work_dir)
+
+    from chainlit.config import config, init_config, load_module
+    from chainlit.logger import logger
+    from chainlit.telemetry import chainlit_telemetry
+
+    init_config()
+    # Do not report the benchmark runs, nor persist their messages
+    config.project.enable_telemetry = False
+    chainlit_telemetry.enabled = False
+    config.project.database = None
+    config.run.headless = True
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    load_module(os.path.join(BENCHMARKS_DIR, "app.py"))
+
+    port = args.port or get_free_port()
+    server = Server(port)
+    server.start()
+
+    cpu_start = server.cpu_time()
+    process_cpu_start = time.process_time()
+    started_at = time.perf_counter()
+    try:
+        results = asyncio.run(run_clients(f"http://127.0.0.1:{port}", args))
+    finally:
+        duration = time.perf_counter() - started_at
+        cpu_end = server.cpu_time()
+        process_cpu = time.process_time() - process_cpu_start
+        server.stop()
+
+    server_cpu = (
+        cpu_end - cpu_start if cpu_start is not None and cpu_end is not None else None
+    )
+
+    return {
+        "benchmark": "websocket_roundtrip",
+        "params": {
+            "clients": args.clients,
+            "messages": args.messages,
+            "tokens": args.tokens,
+            "token_size": args.token_size,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "duration_s": duration,
+        "messages": len(results["latencies"]),
+        "timeouts": results["timeouts"],
+        "messages_per_s": len(results["latencies"]) / duration,
+        "tokens": results["tokens"],
+        "tokens_per_s": results["tokens"] / duration,
+        "latency_ms": summarize(results["latencies"]),
+        "first_token_latency_ms": summarize(results["first_token_latencies"]),
+        # CPU of the server event loop thread, the clients run in the main thread
+        "server_cpu_s": server_cpu,
+        "server_cpu_percent": server_cpu / duration * 100 if server_cpu else None,
+        "process_cpu_s": process_cpu,
+    }
+
+
+def format_report(report: Dict) -> str:
+    def ms(value):
+        return "n/a" if value is None else f"{value:.1f}ms"
+
+    latency = report["latency_ms"]
+    first_token = report["first_token_latency_ms"]
+    server_cpu = report["server_cpu_percent"]
+    return "\n".join(
+        [
+            f"messages:          {report['messages']} in {report['duration_s']:.2f}s "
+            f"({report['messages_per_s']:.1f}/s, {report['timeouts']} timeouts)",
+            f"tokens:            {report['tokens']} ({report['tokens_per_s']:.0f}/s)",
+            f"round-trip:        p50 {ms(latency['p50'])}  p95 {ms(latency['p95'])}  "
+            f"p99 {ms(latency['p99'])}",
+            f"first token:       p50 {ms(first_token['p50'])}  p95 {ms(first_token['p95'])}  "
+            f"p99 {ms(first_token['p99'])}",
+            "server cpu:        "
+            + ("n/a" if server_cpu is None else f"{server_cpu:.0f}%"),
+        ]
+    )
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Return the metrics that regressed by more than max_regression percent."""
+    regressions = []
+    checks = [
+        ("round-trip p95", report["latency_ms"]["p95"], baseline["latency_ms"]["p95"]),
+        ("round-trip p99", report["latency_ms"]["p99"], baseline["latency_ms"]["p99"]),
+        # Lower throughput is a regression, compare the inverse
+        (
+            "tokens/s",
+            1 / report["tokens_per_s"] if report["tokens_per_s"] else None,
+            1 / baseline["tokens_per_s"] if baseline["tokens_per_s"] else None,
+        ),
+    ]
+    for name, value, reference in checks:
+        if (
+            value is not None
+            and reference
+            and value > reference * (1 + max_regression / 100)
+        ):
+            regressions.append(f"{name}: {(value / reference - 1) * 100:.0f}% worse")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent clients")
+    parser.add_argument(
+        "--messages", type=int, default=20, help="Messages sent by each client"
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=50, help="Tokens streamed for each message"
+    )
+    parser.add_argument(
+        "--token-size", type=int, default=4, help="Size of a token in characters"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="Timeout of a round-trip in seconds"
+    )
+    parser.add_argument("--port", type=int, default=0, help="Defaults to a free port")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument(
+        "--json", action="store_true", help="Print the JSON report to stdout"
+    )
+    parser.add_argument(
+        "--baseline", help="Fail if the results regressed from this JSON report"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=10,
+        help="Tolerated regression from the baseline in percent",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Keep the app logs")
+    args = parser.parse_args(argv)
+
+    if args.baseline:
+        # Read the baseline before the benchmark changes directory
+        args.baseline = os.path.abspath(args.baseline)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    report = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"Regression {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,13 +23,13 @@ class Action(DataClassJsonMixin):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
     def __post_init__(self) -> None:
-        trace_event(f"init {self.__class__.__name__}")
+        trace_event("init", self.__class__.__name__)
 
     async def send(self, for_id: str):
-        trace_event(f"send {self.__class__.__name__}")
+        trace_event("send", self.__class__.__name__)
         self.forId = for_id
         await context.emitter.emit("action", self.to_dict())
 
     async def remove(self):
-        trace_event(f"remove {self.__class__.__name__}")
+        trace_event("remove", self.__class__.__name__)
         await context.emitter.emit("remove_action", self.to_dict())
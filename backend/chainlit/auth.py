@@ -1,16 +1,24 @@
 import os
 from datetime import datetime, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import jwt
 from chainlit.client.cloud import AppUser, chainlit_client
 from chainlit.config import config
+from chainlit.element_store import ELEMENT_STORE_ROUTE
 from chainlit.oauth_providers import get_configured_oauth_providers
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 
 reuseable_oauth = OAuth2PasswordBearer(tokenUrl="/login", auto_error=False)
 
+# Routes of the element contents, loaded by the browser from their url
+SIGNED_URL_ROUTES = ("/files/", f"{ELEMENT_STORE_ROUTE}/")
+
+# Lifetime (in seconds) of the signed urls, they are signed again when the
+# conversation is loaded from the history
+SIGNED_URL_TTL = 60 * 60 * 24
+
 
 def get_jwt_secret():
     return os.environ.get("CHAINLIT_AUTH_SECRET")
@@ -88,3 +96,53 @@ async def get_current_user(token: str = Depends(reuseable_oauth)):
         return None
 
     return await authenticate_user(token)
+
+
+def sign_url(url: str, username: Optional[str]) -> str:
+    """
+    Add a token to an element content url, for the browser to load it from
+    img, video, audio or a tags, which cannot send the Authorization header.
+    The token is only valid for this url path and user, until it expires.
+    """
+    if not username or not require_login() or not url.startswith(SIGNED_URL_ROUTES):
+        return url
+
+    token = jwt.encode(
+        {
+            "path": url,
+            "username": username,
+            "exp": datetime.utcnow() + timedelta(seconds=SIGNED_URL_TTL),
+        },
+        get_jwt_secret(),
+        algorithm="HS256",
+    )
+    return f"{url}?token={token}"
+
+
+async def get_url_username(
+    request: Request,
+    token: Optional[str] = None,
+    bearer_token: str = Depends(reuseable_oauth),
+) -> Optional[str]:
+    """Username of a request to a signed url, or of its Authorization header."""
+    if not require_login():
+        return None
+
+    if not token:
+        app_user = await authenticate_user(bearer_token)
+        return app_user.username
+
+    try:
+        claims = jwt.decode(
+            token,
+            get_jwt_secret(),
+            algorithms=["HS256"],
+            options={"verify_signature": True},
+        )
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid url token")
+
+    if claims.get("path") != request.url.path:
+        raise HTTPException(status_code=401, detail="Invalid url token")
+
+    return claims["username"]
@@ -1,5 +1,17 @@
 import os
 import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 from chainlit.config import config
 from chainlit.logger import logger
@@ -45,3 +57,68 @@ def cache(func):
         return _cache[cache_key]
 
     return wrapper
+
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Small in-memory cache whose entries expire after ttl seconds.
+    The least recently used entries are evicted once max_size is reached.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, Tuple[float, V]]
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Any], bool]):
+        """Remove the entries whose key matches the predicate."""
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Duration (in seconds) during which a conversation history page is cached
+CONVERSATIONS_CACHE_TTL = 10
+
+# Short lived cache of the conversation history pages, keyed by user
+conversations_cache = TTLCache(
+    ttl=CONVERSATIONS_CACHE_TTL, max_size=1000
+)  # type: TTLCache[Dict]
+
+
+def invalidate_conversations_cache(username: Optional[str] = None):
+    """Drop the cached history pages of a user, or of every user."""
+    if username is None:
+        conversations_cache.clear()
+    else:
+        conversations_cache.invalidate(lambda key: key[0] == username)
@@ -1,5 +1,9 @@
+from abc import ABC, abstractmethod
 from typing import (
+    TYPE_CHECKING,
     Any,
+    AsyncIterable,
+    AsyncIterator,
     Dict,
     Generic,
     List,
@@ -8,8 +12,10 @@ from typing import (
     Optional,
     TypedDict,
     TypeVar,
+    Union,
 )
 
+import aiofiles
 from chainlit.logger import logger
 from chainlit.prompt import Prompt
 from dataclasses_json import DataClassJsonMixin
@@ -17,12 +23,24 @@ from pydantic import BaseModel, Field
 from pydantic.dataclasses import dataclass
 from python_graphql_client import GraphqlClient
 
+if TYPE_CHECKING:
+    from chainlit.client.content_index import ContentIndex
+
 ElementType = Literal[
     "image", "avatar", "text", "pdf", "tasklist", "audio", "video", "file"
 ]
 ElementDisplay = Literal["inline", "side", "page"]
 ElementSize = Literal["small", "medium", "large"]
 
+# Length of the first message preview displayed in the conversation history
+CONVERSATION_PREVIEW_LENGTH = 200
+
+# Size of the chunks element contents are streamed by when uploaded
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Element content to upload, either in memory or streamed
+UploadContent = Union[bytes, str, AsyncIterable[bytes]]
+
 Role = Literal["USER", "ADMIN", "OWNER", "ANONYMOUS"]
 Provider = Literal[
     "credentials", "header", "github", "google", "azure-ad", "okta", "auth0"
@@ -88,6 +106,8 @@ class ConversationDict(TypedDict):
     appUser: Optional[AppUser]
     messages: List[MessageDict]
     elements: Optional[List[ElementDict]]
+    # Only set when the latest messages are loaded lazily, used to load the previous ones
+    messagesPageInfo: Optional[Dict[str, Any]]
 
 
 @dataclass
@@ -116,6 +136,159 @@ class ConversationFilter(BaseModel):
     search: Optional[str]
 
 
+class BaseDBClient(ABC):
+    """Interface shared by the data persistence clients (cloud and local)."""
+
+    # Whether the client accepts conversation ids generated by Chainlit.
+    # If so, conversations are persisted along with their first message or element.
+    lazy_conversations = False
+
+    # Index of the uploaded contents, used to upload identical elements only once
+    content_index = None  # type: Optional[ContentIndex]
+
+    def register_conversation(
+        self, conversation_id: str, app_user_id: Optional[str], tags: List[str]
+    ):
+        """Register a pre-allocated conversation id, only needed if lazy_conversations is set."""
+        raise NotImplementedError
+
+    def unregister_conversation(self, conversation_id: str):
+        """Forget a pre-allocated conversation id that was never written to."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
+        pass
+
+    @abstractmethod
+    async def update_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
+        pass
+
+    @abstractmethod
+    async def get_app_user(self, username: str) -> Optional[PersistedAppUser]:
+        pass
+
+    @abstractmethod
+    async def delete_app_user(self, username: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def create_conversation(
+        self, app_user_id: Optional[str], tags: Optional[List[str]]
+    ) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_conversation_author(self, conversation_id: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def get_conversation(
+        self, conversation_id: str, first: Optional[int] = None
+    ) -> ConversationDict:
+        """
+        Get a conversation with its messages and elements.
+        If first is set, only the latest messages and the elements attached to them are returned.
+        """
+        pass
+
+    @abstractmethod
+    async def get_messages(
+        self, conversation_id: str, pagination: Pagination, latest_first: bool = False
+    ) -> PaginatedResponse[MessageDict]:
+        """
+        Get a page of messages, always in chronological order.
+        If latest_first is set, pages are walked from the most recent message backwards.
+        """
+        pass
+
+    @abstractmethod
+    async def get_elements(
+        self,
+        conversation_id: str,
+        pagination: Pagination,
+        for_ids: Optional[List[str]] = None,
+    ) -> PaginatedResponse[ElementDict]:
+        """Get a page of elements, optionally only the ones attached to the given messages."""
+        pass
+
+    @abstractmethod
+    async def get_conversations(
+        self, pagination: Pagination, filter: ConversationFilter
+    ) -> PaginatedResponse[ConversationDict]:
+        pass
+
+    @abstractmethod
+    async def set_human_feedback(
+        self, message_id: str, feedback: int, feedbackComment: Optional[str]
+    ) -> bool:
+        pass
+
+    @abstractmethod
+    async def create_message(self, variables: MessageDict) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def update_message(self, message_id: str, variables: MessageDict) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete_message(self, message_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_element(
+        self, conversation_id: str, element_id: str
+    ) -> Optional[ElementDict]:
+        pass
+
+    @abstractmethod
+    async def create_element(self, variables: ElementDict) -> Optional[ElementDict]:
+        pass
+
+    @abstractmethod
+    async def update_element(self, variables: ElementDict) -> Optional[ElementDict]:
+        pass
+
+    @abstractmethod
+    async def upload_element(
+        self,
+        content: Optional[UploadContent],
+        mime: str,
+        conversation_id: Optional[str],
+        path: Optional[str] = None,
+    ) -> Dict:
+        """Upload the content, or stream the file at path if no content is given."""
+        pass
+
+
+async def iter_upload_content(
+    content: Optional[UploadContent] = None,
+    path: Optional[str] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Yield the content to upload by chunks, without loading files in memory."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    if isinstance(content, bytes):
+        for start in range(0, len(content), chunk_size):
+            yield content[start : start + chunk_size]
+    elif content is not None:
+        async for chunk in content:
+            yield chunk
+    elif path:
+        async with aiofiles.open(path, "rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+    else:
+        raise ValueError("Must provide content or path to upload element")
+
+
 class ChainlitGraphQLClient:
     def __init__(self, api_key: str, chainlit_server: str):
         self.headers = {"content-type": "application/json"}
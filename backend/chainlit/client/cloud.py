@@ -1,13 +1,19 @@
+import dataclasses
 import os
+import tempfile
 import uuid
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, TypeVar
 
+import aiofiles
 import aiohttp
-from chainlit.config import config
+from chainlit.cache import TTLCache
+from chainlit.config import config, config_dir
 from chainlit.logger import logger
 
 from .base import (
+    CONVERSATION_PREVIEW_LENGTH,
     AppUser,
+    BaseDBClient,
     ChainlitGraphQLClient,
     ConversationDict,
     ConversationFilter,
@@ -17,10 +23,51 @@ from .base import (
     PaginatedResponse,
     Pagination,
     PersistedAppUser,
+    UploadContent,
+    iter_upload_content,
 )
+from .content_index import ContentIndex
+from .instrumented import instrument_client
+
+T = TypeVar("T")
+
+# Seconds an uploaded content is reused for before being uploaded again
+CLOUD_CONTENT_MAX_AGE = 15 * 60
+# Seconds a conversation fetched to be paginated is reused for the next pages
+CONVERSATION_PAGES_TTL = 30
+
+
+def paginate(
+    items: List[T], pagination: Pagination, latest_first: bool = False
+) -> PaginatedResponse[T]:
+    """
+    Cursor paginate a list of dicts by id. Pages are always returned in the list order.
+    An unknown cursor (e.g. a deleted item) returns an empty last page, like the local client.
+    """
+    if latest_first:
+        items = items[::-1]
+
+    start = 0
+    if pagination.cursor:
+        ids = [item["id"] for item in items]  # type: ignore
+        start = (
+            ids.index(pagination.cursor) + 1 if pagination.cursor in ids else len(items)
+        )
+
+    page = items[start : start + pagination.first]
+    has_next_page = start + pagination.first < len(items)
+    end_cursor = page[-1]["id"] if page else None  # type: ignore
+
+    if latest_first:
+        page.reverse()
+
+    return PaginatedResponse(
+        pageInfo=PageInfo(hasNextPage=has_next_page, endCursor=end_cursor),
+        data=page,
+    )
 
 
-class ChainlitCloudClient(ChainlitGraphQLClient):
+class ChainlitCloudClient(ChainlitGraphQLClient, BaseDBClient):
     chainlit_server: str
 
     def __init__(self, api_key: str, chainlit_server="https://cloud.chainlit.io"):
@@ -28,6 +75,16 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         chainlit_server = chainlit_server.rstrip("/")
         super().__init__(api_key=api_key, chainlit_server=chainlit_server)
         self.chainlit_server = chainlit_server
+        self.conversation_pages = TTLCache(
+            ttl=CONVERSATION_PAGES_TTL, max_size=100
+        )  # type: TTLCache[ConversationDict]
+
+    def _invalidate_pages(self, conversation_id: Optional[str] = None):
+        """Drop the cached conversation, or all of them if it is unknown."""
+        if conversation_id:
+            self.conversation_pages.invalidate(lambda key: key == conversation_id)
+        else:
+            self.conversation_pages.clear()
 
     async def create_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
         mutation = """
@@ -151,6 +208,10 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         variables = {"id": conversation_id}
         res = await self.mutation(mutation, variables)
         self.check_for_errors(res, raise_error=True)
+        self._invalidate_pages(conversation_id)
+
+        if self.content_index:
+            await self.content_index.release_conversation(conversation_id)
 
         return True
 
@@ -175,7 +236,9 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         else:
             return None
 
-    async def get_conversation(self, conversation_id: str) -> ConversationDict:
+    async def get_conversation(
+        self, conversation_id: str, first: Optional[int] = None
+    ) -> ConversationDict:
         query = """
         query ($id: ID!) {
             conversation(id: $id) {
@@ -218,7 +281,53 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         res = await self.query(query, variables)
         self.check_for_errors(res, raise_error=True)
 
-        return res["data"]["conversation"]
+        conversation = res["data"]["conversation"]
+
+        if first:
+            page = paginate(
+                conversation["messages"],
+                Pagination(first=first, cursor=None),
+                latest_first=True,
+            )
+            visible_ids = {m["id"] for m in page.data}
+            conversation["messages"] = page.data
+            conversation["elements"] = [
+                e
+                for e in conversation["elements"] or []
+                if visible_ids.intersection(e.get("forIds") or [])
+            ]
+            conversation["messagesPageInfo"] = dataclasses.asdict(page.pageInfo)
+
+        return conversation
+
+    # The cloud API returns a conversation in a single query, the pagination happens here.
+    # The conversation is kept for the next pages instead of being fetched for each page.
+    async def _get_paged_conversation(self, conversation_id: str) -> ConversationDict:
+        conversation = self.conversation_pages.get(conversation_id)
+        if conversation is None:
+            conversation = await self.get_conversation(conversation_id)
+            self.conversation_pages.set(conversation_id, conversation)
+        return conversation
+
+    async def get_messages(
+        self, conversation_id: str, pagination: Pagination, latest_first: bool = False
+    ) -> PaginatedResponse[MessageDict]:
+        conversation = await self._get_paged_conversation(conversation_id)
+        return paginate(conversation["messages"], pagination, latest_first)
+
+    async def get_elements(
+        self,
+        conversation_id: str,
+        pagination: Pagination,
+        for_ids: Optional[List[str]] = None,
+    ) -> PaginatedResponse[ElementDict]:
+        conversation = await self._get_paged_conversation(conversation_id)
+        elements = conversation["elements"] or []
+        if for_ids is not None:
+            elements = [
+                e for e in elements if set(for_ids).intersection(e.get("forIds") or [])
+            ]
+        return paginate(elements, pagination)
 
     async def get_conversations(
         self, pagination: Pagination, filter: ConversationFilter
@@ -274,6 +383,12 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
 
         for edge in res["data"]["conversations"]["edges"]:
             node = edge["node"]
+            # Only keep a preview of the first message, the listing does not need the history
+            messages = node.get("messages") or []
+            preview = messages[0]["content"] if messages else None
+            if preview:
+                preview = preview[:CONVERSATION_PREVIEW_LENGTH]
+            node["messages"] = [{"content": preview}]
             conversations.append(node)
 
         page_info = res["data"]["conversations"]["pageInfo"]
@@ -319,6 +434,7 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         }
         """
         res = await self.mutation(mutation, variables)
+        self._invalidate_pages(variables.get("conversationId"))
         if self.check_for_errors(res):
             logger.warning("Could not create message.")
             return None
@@ -334,6 +450,7 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         }
         """
         res = await self.mutation(mutation, dict(messageId=message_id, **variables))
+        self._invalidate_pages(variables.get("conversationId"))
 
         if self.check_for_errors(res):
             logger.warning("Could not update message.")
@@ -350,6 +467,7 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         }
         """
         res = await self.mutation(mutation, {"messageId": message_id})
+        self._invalidate_pages()
 
         if self.check_for_errors(res):
             logger.warning("Could not delete message.")
@@ -406,6 +524,7 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         }
         """
         res = await self.mutation(mutation, variables)
+        self._invalidate_pages(variables.get("conversationId"))
 
         if self.check_for_errors(res):
             logger.warning("Could not create element.")
@@ -423,6 +542,7 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         """
 
         res = await self.mutation(mutation, variables)
+        self._invalidate_pages(variables.get("conversationId"))
 
         if self.check_for_errors(res):
             logger.warning("Could not update element.")
@@ -431,19 +551,40 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         return res["data"]["updateElement"]
 
     async def upload_element(
-        self, content: Union[bytes, str], mime: str, conversation_id: Optional[str]
+        self,
+        content: Optional[UploadContent],
+        mime: str,
+        conversation_id: Optional[str],
+        path: Optional[str] = None,
     ) -> Dict:
+        if content is not None and not isinstance(content, (bytes, str)):
+            # The presigned upload needs the content length up front,
+            # spool the stream to disk rather than buffering it in memory
+            fd, tmp_path = tempfile.mkstemp(prefix="chainlit-upload-")
+            os.close(fd)
+            try:
+                async with aiofiles.open(tmp_path, "wb") as f:
+                    async for chunk in iter_upload_content(content):
+                        await f.write(chunk)
+                return await self.upload_element(
+                    None, mime, conversation_id, path=tmp_path
+                )
+            finally:
+                os.remove(tmp_path)
+
+        if content is None and path is None:
+            logger.error("Failed to upload file: no content or path given")
+            return {"object_key": None, "url": None}
+
         id = str(uuid.uuid4())
         body = {"fileName": id, "contentType": mime}
 
         if conversation_id:
             body["conversationId"] = conversation_id
 
-        path = f"/api/upload/file"
-
         async with aiohttp.ClientSession() as session:
             async with session.post(
-                f"{self.chainlit_server}{path}",
+                f"{self.chainlit_server}/api/upload/file",
                 json=body,
                 headers=self.headers,
             ) as r:
@@ -457,6 +598,18 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
         object_key = upload_details["fields"]["key"]
         signed_url = json_res["signedUrl"]
 
+        if content is not None:
+            ok = await self._post_upload(upload_details, content)
+        elif path is not None:
+            # aiohttp streams file objects by chunks
+            with open(path, "rb") as f:
+                ok = await self._post_upload(upload_details, f)
+
+        if not ok:
+            return {"object_key": None, "url": None}
+        return {"object_key": object_key, "url": signed_url}
+
+    async def _post_upload(self, upload_details: Dict, file: Any) -> bool:
         form_data = aiohttp.FormData()
 
         # Add fields to the form_data
@@ -464,7 +617,7 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
             form_data.add_field(field_name, field_value)
 
         # Add file to the form_data
-        form_data.add_field("file", content, content_type="multipart/form-data")
+        form_data.add_field("file", file, content_type="multipart/form-data")
         async with aiohttp.ClientSession() as session:
             async with session.post(
                 upload_details["url"],
@@ -473,16 +626,34 @@ class ChainlitCloudClient(ChainlitGraphQLClient):
                 if not upload_response.ok:
                     reason = await upload_response.text()
                     logger.error(f"Failed to upload file: {reason}")
-                    return {"object_key": None, "url": None}
+                    return False
+                return True
 
-                url = f'{upload_details["url"]}/{object_key}'
-                return {"object_key": object_key, "url": signed_url}
 
+chainlit_client = None  # type: Optional[BaseDBClient]
 
-chainlit_client = None  # type: Optional[ChainlitCloudClient]
+if config.project.database == "local":
+    from chainlit.client.local import ChainlitLocalClient
 
-if config.data_persistence:
-    chainlit_client = ChainlitCloudClient(
+    local_client = ChainlitLocalClient(
+        db_path=config.project.local_db_path,
+        fs_path=config.project.local_fs_path,
+    )
+    local_client.content_index = ContentIndex(config.project.local_db_path)
+    chainlit_client = instrument_client(local_client)
+elif config.data_persistence:
+    from chainlit.client.resilient import ResilientClient
+
+    cloud_client = ChainlitCloudClient(
         api_key=os.environ.get("CHAINLIT_API_KEY", ""),
         chainlit_server=config.chainlit_server,
     )
+    # The uploads are served through expiring presigned urls
+    cloud_client.content_index = ContentIndex(
+        os.path.join(config_dir, "cloud_elements.db"),
+        max_age=CLOUD_CONTENT_MAX_AGE,
+    )
+    chainlit_client = ResilientClient(
+        instrument_client(cloud_client),
+        spool_path=os.path.join(config_dir, "spool", "persistence.jsonl"),
+    )
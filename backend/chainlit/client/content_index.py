@@ -0,0 +1,195 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from asyncer import asyncify
+
+from .base import UPLOAD_CHUNK_SIZE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    hash TEXT PRIMARY KEY,
+    objectKey TEXT NOT NULL,
+    url TEXT,
+    createdAt INTEGER NOT NULL,
+    -- Maintained by triggers
+    refCount INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS contents_object_key ON contents(objectKey);
+
+CREATE TABLE IF NOT EXISTS content_refs (
+    hash TEXT NOT NULL REFERENCES contents(hash) ON DELETE CASCADE,
+    elementId TEXT NOT NULL,
+    conversationId TEXT,
+    PRIMARY KEY (hash, elementId)
+);
+CREATE INDEX IF NOT EXISTS content_refs_conversation ON content_refs(conversationId);
+
+CREATE TRIGGER IF NOT EXISTS contents_ref_insert AFTER INSERT ON content_refs BEGIN
+    UPDATE contents SET refCount = refCount + 1 WHERE hash = new.hash;
+END;
+
+CREATE TRIGGER IF NOT EXISTS contents_ref_delete AFTER DELETE ON content_refs BEGIN
+    UPDATE contents SET refCount = refCount - 1 WHERE hash = old.hash;
+END;
+"""
+
+
+def hash_content(content: Optional[Union[bytes, str]], path: Optional[str]) -> str:
+    """Hash the element content, files are read by chunks."""
+    digest = hashlib.sha256()
+    if content:
+        digest.update(content.encode("utf-8") if isinstance(content, str) else content)
+    elif path:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        raise ValueError("Must provide content or path to hash element")
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """
+    Local index of the uploaded element contents by hash, so that the same file
+    is only uploaded once. Each element using a content holds a reference to it,
+    contents no longer referenced can be deleted from the storage.
+    """
+
+    def __init__(self, db_path: str, max_age: Optional[int] = None):
+        # Contents older than max_age seconds are uploaded again (expiring urls)
+        self.max_age = max_age
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.conn.executescript(SCHEMA)
+
+    async def hash(
+        self, content: Optional[Union[bytes, str]], path: Optional[str]
+    ) -> str:
+        return await asyncify(hash_content)(content, path)
+
+    def _select(self, content_hash: str) -> Optional[Dict]:
+        min_created_at = int((time.time() - self.max_age) * 1000) if self.max_age else 0
+        row = self.conn.execute(
+            """SELECT objectKey, url FROM contents
+            WHERE hash = ? AND createdAt >= ?""",
+            (content_hash, min_created_at),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _lookup(self, content_hash: str) -> Optional[Dict]:
+        with self.lock:
+            return self._select(content_hash)
+
+    async def lookup(self, content_hash: str) -> Optional[Dict]:
+        """Return the object_key and url of an already uploaded content."""
+        return await asyncify(self._lookup)(content_hash)
+
+    def _add(
+        self,
+        content_hash: str,
+        object_key: str,
+        url: Optional[str],
+        conversation_id: Optional[str],
+        element_id: str,
+    ):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute(
+                    """INSERT INTO contents (hash, objectKey, url, createdAt)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(hash) DO UPDATE SET
+                        objectKey = excluded.objectKey,
+                        url = excluded.url,
+                        createdAt = excluded.createdAt""",
+                    (content_hash, object_key, url, int(time.time() * 1000)),
+                )
+                self.conn.execute(
+                    """INSERT OR IGNORE INTO content_refs (hash, elementId, conversationId)
+                    VALUES (?, ?, ?)""",
+                    (content_hash, element_id, conversation_id),
+                )
+
+    async def add(
+        self,
+        content_hash: str,
+        object_key: str,
+        url: Optional[str],
+        conversation_id: Optional[str],
+        element_id: str,
+    ):
+        """Index a newly uploaded content, referenced by the element."""
+        await asyncify(self._add)(
+            content_hash, object_key, url, conversation_id, element_id
+        )
+
+    def _acquire(
+        self, content_hash: str, conversation_id: Optional[str], element_id: str
+    ) -> Optional[Dict]:
+        with self.lock:
+            # Looked up in the same transaction, the content cannot be released
+            # by a deleted conversation before it is referenced
+            with self.conn:
+                self.conn.execute("BEGIN")
+                stored = self._select(content_hash)
+                if stored:
+                    self.conn.execute(
+                        """INSERT OR IGNORE INTO content_refs (hash, elementId, conversationId)
+                        VALUES (?, ?, ?)""",
+                        (content_hash, element_id, conversation_id),
+                    )
+        return stored
+
+    async def acquire(
+        self, content_hash: str, conversation_id: Optional[str], element_id: str
+    ) -> Optional[Dict]:
+        """
+        Reference an already uploaded content from another element.
+        Return its object_key and url, None if it has to be uploaded.
+        """
+        return await asyncify(self._acquire)(content_hash, conversation_id, element_id)
+
+    def _release_conversation(self, conversation_id: str) -> List[str]:
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute(
+                    "DELETE FROM content_refs WHERE conversationId = ?",
+                    (conversation_id,),
+                )
+                orphans = self.conn.execute(
+                    "SELECT objectKey FROM contents WHERE refCount <= 0"
+                ).fetchall()
+                self.conn.execute("DELETE FROM contents WHERE refCount <= 0")
+        return [row["objectKey"] for row in orphans]
+
+    async def release_conversation(self, conversation_id: str) -> List[str]:
+        """
+        Drop the references held by the elements of a deleted conversation.
+        Return the object keys of the contents no longer referenced.
+        """
+        return await asyncify(self._release_conversation)(conversation_id)
+
+    def _is_referenced(self, object_key: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM contents WHERE objectKey = ? AND refCount > 0",
+                (object_key,),
+            ).fetchone()
+        return row is not None
+
+    async def is_referenced(self, object_key: str) -> bool:
+        return await asyncify(self._is_referenced)(object_key)
@@ -0,0 +1,47 @@
+import inspect
+import time
+from functools import wraps
+from typing import cast
+
+from chainlit.metrics import reply_metrics
+from chainlit.tracing import start_span
+
+from .base import BaseDBClient
+
+
+class InstrumentedClient:
+    """
+    Wrap a persistence client to trace and time each of its calls.
+    The other attributes are read from the wrapped client.
+    """
+
+    def __init__(self, client: BaseDBClient):
+        self.client = client
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.client, name)
+        if name.startswith("_") or not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @wraps(attr)
+        async def instrumented_call(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                with start_span(
+                    f"persistence {name}",
+                    {"chainlit.persistence.client": type(self.client).__name__},
+                ):
+                    return await attr(*args, **kwargs)
+            finally:
+                from chainlit.context import context_var
+
+                if context := context_var.get(None):
+                    reply_metrics.record_persistence(
+                        context.session.id, time.monotonic() - start
+                    )
+
+        return instrumented_call
+
+
+def instrument_client(client: BaseDBClient) -> BaseDBClient:
+    return cast(BaseDBClient, InstrumentedClient(client))
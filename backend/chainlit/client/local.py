@@ -0,0 +1,876 @@
+import dataclasses
+import html
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, cast
+
+import aiofiles
+from asyncer import asyncify
+from chainlit.logger import logger
+
+from .base import (
+    CONVERSATION_PREVIEW_LENGTH,
+    AppUser,
+    BaseDBClient,
+    ConversationDict,
+    ConversationFilter,
+    ElementDict,
+    MessageDict,
+    PageInfo,
+    PaginatedResponse,
+    Pagination,
+    PersistedAppUser,
+    UploadContent,
+    iter_upload_content,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    role TEXT NOT NULL DEFAULT 'USER',
+    tags TEXT,
+    image TEXT,
+    provider TEXT,
+    createdAt INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    appUserId TEXT REFERENCES app_users(id) ON DELETE SET NULL,
+    tags TEXT,
+    createdAt INTEGER NOT NULL,
+    -- Denormalized for the history listing, maintained by triggers
+    preview TEXT,
+    messageCount INTEGER NOT NULL DEFAULT 0,
+    elementCount INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS conversations_app_user_created_at
+    ON conversations(appUserId, createdAt DESC, id DESC);
+CREATE INDEX IF NOT EXISTS conversations_created_at
+    ON conversations(createdAt DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    -- Explicit integer key so that the full-text index rowids stay stable
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    conversationId TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    createdAt INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    content TEXT NOT NULL DEFAULT '',
+    language TEXT,
+    prompt TEXT,
+    isError INTEGER,
+    parentId TEXT,
+    indent INTEGER,
+    authorIsUser INTEGER,
+    waitForAnswer INTEGER,
+    humanFeedback INTEGER NOT NULL DEFAULT 0,
+    humanFeedbackComment TEXT,
+    disableHumanFeedback INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_conversation_created_at
+    ON messages(conversationId, createdAt);
+CREATE INDEX IF NOT EXISTS messages_conversation_feedback
+    ON messages(conversationId, humanFeedback);
+
+CREATE TABLE IF NOT EXISTS elements (
+    id TEXT PRIMARY KEY,
+    conversationId TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    url TEXT,
+    objectKey TEXT,
+    name TEXT NOT NULL,
+    display TEXT NOT NULL,
+    size TEXT,
+    language TEXT,
+    forIds TEXT
+);
+CREATE INDEX IF NOT EXISTS elements_conversation
+    ON elements(conversationId);
+
+CREATE TRIGGER IF NOT EXISTS conversations_message_insert AFTER INSERT ON messages BEGIN
+    UPDATE conversations
+    SET messageCount = messageCount + 1,
+        preview = COALESCE(preview, substr(new.content, 1, {preview_length}))
+    WHERE id = new.conversationId;
+END;
+
+CREATE TRIGGER IF NOT EXISTS conversations_message_update AFTER UPDATE OF content ON messages BEGIN
+    UPDATE conversations SET preview = substr(new.content, 1, {preview_length})
+    WHERE id = new.conversationId AND NOT EXISTS (
+        SELECT 1 FROM messages m WHERE m.conversationId = new.conversationId AND m.seq < new.seq
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS conversations_message_delete AFTER DELETE ON messages BEGIN
+    UPDATE conversations SET messageCount = messageCount - 1 WHERE id = old.conversationId;
+END;
+
+CREATE TRIGGER IF NOT EXISTS conversations_element_insert AFTER INSERT ON elements BEGIN
+    UPDATE conversations SET elementCount = elementCount + 1 WHERE id = new.conversationId;
+END;
+
+CREATE TRIGGER IF NOT EXISTS conversations_element_delete AFTER DELETE ON elements BEGIN
+    UPDATE conversations SET elementCount = elementCount - 1 WHERE id = old.conversationId;
+END;
+""".format(
+    preview_length=CONVERSATION_PREVIEW_LENGTH
+)
+
+# Full-text index over the message contents, kept up to date by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content,
+    content='messages',
+    content_rowid='seq',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.seq, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.seq, old.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.seq, old.content);
+    INSERT INTO messages_fts(rowid, content) VALUES (new.seq, new.content);
+END;
+"""
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# The snippets are marked with private use characters, which are replaced by the
+# highlight tags once the message content is escaped
+SNIPPET_START = "\ue000"
+SNIPPET_END = "\ue001"
+
+MESSAGE_COLUMNS = [
+    "id",
+    "createdAt",
+    "author",
+    "content",
+    "language",
+    "prompt",
+    "isError",
+    "parentId",
+    "indent",
+    "authorIsUser",
+    "waitForAnswer",
+    "humanFeedback",
+    "humanFeedbackComment",
+    "disableHumanFeedback",
+]
+
+ELEMENT_COLUMNS = [
+    "id",
+    "conversationId",
+    "type",
+    "name",
+    "url",
+    "objectKey",
+    "display",
+    "language",
+    "size",
+    "forIds",
+]
+
+CONVERSATION_LISTING_COLUMNS = (
+    "c.id, c.createdAt, c.tags, c.preview, c.messageCount, c.elementCount, u.username"
+)
+
+BOOLEAN_MESSAGE_COLUMNS = [
+    "isError",
+    "authorIsUser",
+    "waitForAnswer",
+    "disableHumanFeedback",
+]
+
+
+def now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def to_timestamp(value: Union[int, float, str, None]) -> int:
+    """Normalize a createdAt value (ms timestamp or ISO string) to a ms timestamp."""
+    if value is None:
+        return now_ms()
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    try:
+        date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return now_ms()
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+def to_json(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value)
+
+
+def from_json(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
+
+
+def to_highlight(snippet: str) -> str:
+    """Escape the snippet of a message, only the highlight tags are HTML."""
+    return (
+        html.escape(snippet)
+        .replace(SNIPPET_START, HIGHLIGHT_START)
+        .replace(SNIPPET_END, HIGHLIGHT_END)
+    )
+
+
+def to_fts_query(search: str) -> str:
+    """Turn free text into a FTS5 query matching every term as a prefix."""
+    terms = [term.replace('"', '""') for term in search.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def to_like_pattern(search: str) -> str:
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class ChainlitLocalClient(BaseDBClient):
+    """
+    Data persistence client backed by a local SQLite database.
+    Element files are stored on the local file system and served by the /files endpoint.
+    """
+
+    db_path: str
+    fs_path: str
+    lazy_conversations = True
+
+    def __init__(self, db_path: str, fs_path: str):
+        self.db_path = db_path
+        self.fs_path = fs_path
+        # Pre-allocated conversations not persisted yet, by id
+        self.pending_conversations = (
+            {}
+        )  # type: Dict[str, Tuple[Optional[str], List[str], int]]
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        os.makedirs(fs_path, exist_ok=True)
+
+        # A single connection is shared by the worker threads, access is serialized by the lock
+        self.conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.conn.executescript(SCHEMA)
+            self.fts_enabled = self._init_fts()
+
+    def _init_fts(self) -> bool:
+        """Create the full-text index. Fall back to LIKE queries if FTS5 is not available."""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone()
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 is not available, search will be slower: {e}")
+            return False
+
+        if not exists:
+            # Index the messages persisted before the index was created
+            self.conn.execute(
+                "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"
+            )
+        return True
+
+    def _run(self, statements: Sequence[Any], fetch: Optional[str] = None):
+        """Execute (sql, params) statements in a single transaction."""
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("BEGIN")
+                result = None  # type: Any
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                if fetch == "one":
+                    row = cursor.fetchone()
+                    result = dict(row) if row else None
+                elif fetch == "all":
+                    result = [dict(row) for row in cursor.fetchall()]
+                else:
+                    result = cursor.rowcount
+                cursor.execute("COMMIT")
+                return result
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        return await asyncify(self._run)([(sql, params)])
+
+    async def fetchone(
+        self, sql: str, params: Sequence[Any] = ()
+    ) -> Optional[Dict[str, Any]]:
+        return await asyncify(self._run)([(sql, params)], fetch="one")
+
+    async def fetchall(
+        self, sql: str, params: Sequence[Any] = ()
+    ) -> List[Dict[str, Any]]:
+        return await asyncify(self._run)([(sql, params)], fetch="all")
+
+    @staticmethod
+    def _to_app_user(row: Optional[Dict[str, Any]]) -> Optional[PersistedAppUser]:
+        if not row:
+            return None
+        row["tags"] = from_json(row["tags"]) or []
+        return PersistedAppUser.from_dict(row)
+
+    @staticmethod
+    def _to_message(row: Dict[str, Any]) -> MessageDict:
+        row["prompt"] = from_json(row.get("prompt"))
+        for key in BOOLEAN_MESSAGE_COLUMNS:
+            if row.get(key) is not None:
+                row[key] = bool(row[key])
+        return row  # type: ignore
+
+    @staticmethod
+    def _to_conversation_listing(
+        row: Dict[str, Any], highlight: Optional[str] = None
+    ) -> ConversationDict:
+        listing = {
+            "id": row["id"],
+            "createdAt": row["createdAt"],
+            "tags": from_json(row["tags"]) or [],
+            "elementCount": row["elementCount"],
+            "messageCount": row["messageCount"],
+            "appUser": {"username": row["username"]} if row["username"] else None,
+            "messages": [{"content": row["preview"]}],
+        }
+        if highlight is not None:
+            listing["highlight"] = highlight
+        # Only the fields displayed in the conversation history are listed
+        return cast(ConversationDict, listing)
+
+    @staticmethod
+    def _to_element(row: Dict[str, Any]) -> ElementDict:
+        row["forIds"] = from_json(row.get("forIds")) or []
+        return row  # type: ignore
+
+    async def create_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
+        await self.execute(
+            """INSERT INTO app_users (id, username, role, tags, image, provider, createdAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(username) DO NOTHING""",
+            (
+                str(uuid.uuid4()),
+                app_user.username,
+                app_user.role,
+                to_json(app_user.tags),
+                app_user.image,
+                app_user.provider,
+                now_ms(),
+            ),
+        )
+        return await self.get_app_user(app_user.username)
+
+    async def update_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
+        await self.execute(
+            "UPDATE app_users SET role = ?, tags = ?, image = ?, provider = ? WHERE username = ?",
+            (
+                app_user.role,
+                to_json(app_user.tags),
+                app_user.image,
+                app_user.provider,
+                app_user.username,
+            ),
+        )
+        return await self.get_app_user(app_user.username)
+
+    async def get_app_user(self, username: str) -> Optional[PersistedAppUser]:
+        row = await self.fetchone(
+            "SELECT id, username, role, tags, image, provider, createdAt FROM app_users WHERE username = ?",
+            (username,),
+        )
+        return self._to_app_user(row)
+
+    async def delete_app_user(self, username: str) -> bool:
+        await self.execute("DELETE FROM app_users WHERE username = ?", (username,))
+        return True
+
+    def register_conversation(
+        self, conversation_id: str, app_user_id: Optional[str], tags: List[str]
+    ):
+        self.pending_conversations[conversation_id] = (app_user_id, tags, now_ms())
+
+    def unregister_conversation(self, conversation_id: str):
+        self.pending_conversations.pop(conversation_id, None)
+
+    def _pending_conversation_statements(self, conversation_id: Optional[str]):
+        """Statements persisting a pre-allocated conversation, run in the same transaction as its first write."""
+        pending = self.pending_conversations.get(conversation_id or "")
+        if not pending:
+            return []
+        app_user_id, tags, created_at = pending
+        return [
+            (
+                "INSERT OR IGNORE INTO conversations (id, appUserId, tags, createdAt) VALUES (?, ?, ?, ?)",
+                (conversation_id, app_user_id, to_json(tags), created_at),
+            )
+        ]
+
+    async def _write(
+        self, conversation_id: Optional[str], sql: str, params: Sequence[Any]
+    ):
+        statements = self._pending_conversation_statements(conversation_id)
+        await asyncify(self._run)([*statements, (sql, params)])
+        if statements:
+            self.pending_conversations.pop(conversation_id or "", None)
+
+    async def create_conversation(
+        self, app_user_id: Optional[str], tags: Optional[List[str]]
+    ) -> Optional[str]:
+        conversation_id = str(uuid.uuid4())
+        await self.execute(
+            "INSERT INTO conversations (id, appUserId, tags, createdAt) VALUES (?, ?, ?, ?)",
+            (conversation_id, app_user_id, to_json(tags or []), now_ms()),
+        )
+        return conversation_id
+
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        await self.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+        conversation_dir = self._conversation_dir(conversation_id)
+        if not self.content_index:
+            await asyncify(shutil.rmtree)(conversation_dir, ignore_errors=True)
+            return True
+
+        # Files can be shared with other conversations through the content index
+        orphans = await self.content_index.release_conversation(conversation_id)
+        for object_key in orphans:
+            await self._delete_file(object_key)
+        if os.path.isdir(conversation_dir):
+            for name in await asyncify(os.listdir)(conversation_dir):
+                object_key = f"{conversation_id}/{name}"
+                if not await self.content_index.is_referenced(object_key):
+                    await self._delete_file(object_key)
+
+        return True
+
+    async def _delete_file(self, object_key: str):
+        file_path = os.path.join(self.fs_path, object_key)
+        try:
+            await asyncify(os.remove)(file_path)
+            # Remove the conversation directory once empty
+            await asyncify(os.rmdir)(os.path.dirname(file_path))
+        except OSError:
+            pass
+
+    async def get_conversation_author(self, conversation_id: str) -> Optional[str]:
+        row = await self.fetchone(
+            """SELECT u.username FROM conversations c
+            LEFT JOIN app_users u ON u.id = c.appUserId
+            WHERE c.id = ?""",
+            (conversation_id,),
+        )
+        return row["username"] if row else None
+
+    async def get_conversation(
+        self, conversation_id: str, first: Optional[int] = None
+    ) -> ConversationDict:
+        conversation = await self.fetchone(
+            "SELECT id, createdAt, tags FROM conversations WHERE id = ?",
+            (conversation_id,),
+        )
+        if not conversation:
+            raise Exception(f"Conversation {conversation_id} not found")
+
+        conversation["tags"] = from_json(conversation["tags"]) or []
+
+        if first:
+            page = await self.get_messages(
+                conversation_id, Pagination(first=first, cursor=None), latest_first=True
+            )
+            conversation["messages"] = page.data
+            conversation["elements"] = await self._fetch_elements(
+                conversation_id, for_ids=[m["id"] for m in page.data]
+            )
+            conversation["messagesPageInfo"] = dataclasses.asdict(page.pageInfo)
+            return conversation  # type: ignore
+
+        messages = await self.fetchall(
+            f"""SELECT {", ".join(MESSAGE_COLUMNS)} FROM messages
+            WHERE conversationId = ? ORDER BY createdAt, seq""",
+            (conversation_id,),
+        )
+        conversation["messages"] = [self._to_message(m) for m in messages]
+        conversation["elements"] = await self._fetch_elements(conversation_id)
+
+        return conversation  # type: ignore
+
+    async def get_messages(
+        self, conversation_id: str, pagination: Pagination, latest_first: bool = False
+    ) -> PaginatedResponse[MessageDict]:
+        conditions = ["conversationId = ?"]
+        params = [conversation_id]  # type: List[Any]
+
+        if pagination.cursor:
+            conditions.append(
+                f"""(createdAt, seq) {"<" if latest_first else ">"}
+                (SELECT createdAt, seq FROM messages WHERE id = ?)"""
+            )
+            params.append(pagination.cursor)
+
+        order = "DESC" if latest_first else "ASC"
+        params.append(pagination.first + 1)
+
+        rows = await self.fetchall(
+            f"""SELECT {", ".join(MESSAGE_COLUMNS)} FROM messages
+            WHERE {" AND ".join(conditions)}
+            ORDER BY createdAt {order}, seq {order}
+            LIMIT ?""",
+            params,
+        )
+
+        has_next_page = len(rows) > pagination.first
+        rows = rows[: pagination.first]
+        end_cursor = rows[-1]["id"] if rows else None
+
+        if latest_first:
+            rows.reverse()
+
+        return PaginatedResponse(
+            pageInfo=PageInfo(hasNextPage=has_next_page, endCursor=end_cursor),
+            data=[self._to_message(row) for row in rows],
+        )
+
+    async def get_elements(
+        self,
+        conversation_id: str,
+        pagination: Pagination,
+        for_ids: Optional[List[str]] = None,
+    ) -> PaginatedResponse[ElementDict]:
+        rows = await self._fetch_elements(
+            conversation_id,
+            for_ids=for_ids,
+            cursor=pagination.cursor,
+            limit=pagination.first + 1,
+        )
+
+        has_next_page = len(rows) > pagination.first
+        rows = rows[: pagination.first]
+
+        return PaginatedResponse(
+            pageInfo=PageInfo(
+                hasNextPage=has_next_page,
+                endCursor=rows[-1]["id"] if rows else None,
+            ),
+            data=rows,
+        )
+
+    async def _fetch_elements(
+        self,
+        conversation_id: str,
+        for_ids: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[ElementDict]:
+        conditions = ["conversationId = ?"]
+        params = [conversation_id]  # type: List[Any]
+
+        if for_ids is not None:
+            if not for_ids:
+                return []
+            conditions.append(
+                f"""EXISTS (SELECT 1 FROM json_each(elements.forIds)
+                WHERE json_each.value IN ({", ".join("?" for _ in for_ids)}))"""
+            )
+            params.extend(for_ids)
+
+        if cursor:
+            conditions.append("rowid > (SELECT rowid FROM elements WHERE id = ?)")
+            params.append(cursor)
+
+        sql = f"""SELECT {", ".join(ELEMENT_COLUMNS)} FROM elements
+            WHERE {" AND ".join(conditions)} ORDER BY rowid"""
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        rows = await self.fetchall(sql, params)
+        return [self._to_element(row) for row in rows]
+
+    async def get_conversations(
+        self, pagination: Pagination, filter: ConversationFilter
+    ) -> PaginatedResponse[ConversationDict]:
+        # Do not list empty conversations
+        conditions = ["c.messageCount > 0"]
+        params = []  # type: List[Any]
+
+        if filter.username:
+            conditions.append("u.username = ?")
+            params.append(filter.username)
+
+        if filter.feedback:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM messages m WHERE m.conversationId = c.id AND m.humanFeedback = ?)"
+            )
+            params.append(filter.feedback)
+
+        if filter.search and self.fts_enabled and to_fts_query(filter.search):
+            return await self._search_conversations(
+                pagination, to_fts_query(filter.search), conditions, params
+            )
+
+        if filter.search:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM messages m WHERE m.conversationId = c.id AND m.content LIKE ? ESCAPE '\\')"
+            )
+            params.append(to_like_pattern(filter.search))
+
+        if pagination.cursor:
+            conditions.append(
+                "(c.createdAt, c.id) < (SELECT createdAt, id FROM conversations WHERE id = ?)"
+            )
+            params.append(pagination.cursor)
+
+        # Fetch one extra row to know if there is a next page
+        params.append(pagination.first + 1)
+
+        rows = await self.fetchall(
+            f"""SELECT {CONVERSATION_LISTING_COLUMNS}
+            FROM conversations c
+            LEFT JOIN app_users u ON u.id = c.appUserId
+            WHERE {" AND ".join(conditions)}
+            ORDER BY c.createdAt DESC, c.id DESC
+            LIMIT ?""",
+            params,
+        )
+
+        has_next_page = len(rows) > pagination.first
+        rows = rows[: pagination.first]
+
+        return PaginatedResponse(
+            pageInfo=PageInfo(
+                hasNextPage=has_next_page,
+                endCursor=rows[-1]["id"] if rows else None,
+            ),
+            data=[self._to_conversation_listing(row) for row in rows],
+        )
+
+    async def _search_conversations(
+        self,
+        pagination: Pagination,
+        fts_query: str,
+        conditions: List[str],
+        params: List[Any],
+    ) -> PaginatedResponse[ConversationDict]:
+        """Rank the conversations by their best matching message (bm25)."""
+        # Search results are ranked, so the cursor is the offset of the next page
+        cursor = pagination.cursor or ""
+        offset = int(cursor) if cursor.isdigit() else 0
+
+        rows = await self.fetchall(
+            f"""WITH matches AS (
+                SELECT rowid AS seq, rank AS score
+                FROM messages_fts WHERE messages_fts MATCH ?
+            ), best_matches AS (
+                SELECT m.conversationId, ma.seq, MIN(ma.score) AS score
+                FROM matches ma
+                JOIN messages m ON m.seq = ma.seq
+                GROUP BY m.conversationId
+            )
+            SELECT {CONVERSATION_LISTING_COLUMNS}, bm.seq AS matchSeq
+            FROM best_matches bm
+            JOIN conversations c ON c.id = bm.conversationId
+            LEFT JOIN app_users u ON u.id = c.appUserId
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bm.score, c.createdAt DESC, c.id DESC
+            LIMIT ? OFFSET ?""",
+            [fts_query, *params, pagination.first + 1, offset],
+        )
+
+        has_next_page = len(rows) > pagination.first
+        rows = rows[: pagination.first]
+
+        # Only compute the highlights of the returned page
+        highlights = {}  # type: Dict[int, str]
+        if rows:
+            seqs = [row["matchSeq"] for row in rows]
+            highlight_rows = await self.fetchall(
+                f"""SELECT rowid, snippet(messages_fts, 0, ?, ?, '…', 16) AS highlight
+                FROM messages_fts
+                WHERE messages_fts MATCH ? AND rowid IN ({", ".join("?" for _ in seqs)})""",
+                [SNIPPET_START, SNIPPET_END, fts_query, *seqs],
+            )
+            highlights = {
+                r["rowid"]: to_highlight(r["highlight"]) for r in highlight_rows
+            }
+
+        conversations = [
+            self._to_conversation_listing(row, highlights.get(row["matchSeq"]))
+            for row in rows
+        ]
+
+        return PaginatedResponse(
+            pageInfo=PageInfo(
+                hasNextPage=has_next_page,
+                endCursor=str(offset + len(rows)) if rows else None,
+            ),
+            data=conversations,
+        )
+
+    async def set_human_feedback(
+        self, message_id: str, feedback: int, feedbackComment: Optional[str]
+    ) -> bool:
+        await self.execute(
+            "UPDATE messages SET humanFeedback = ?, humanFeedbackComment = ? WHERE id = ?",
+            (feedback, feedbackComment, message_id),
+        )
+        return True
+
+    async def create_message(self, variables: MessageDict) -> Optional[str]:
+        message_id = variables.get("id") or str(uuid.uuid4())
+        try:
+            await self._write(
+                variables.get("conversationId"),
+                """INSERT INTO messages (id, conversationId, createdAt, author, content, language, prompt,
+                    isError, parentId, indent, authorIsUser, waitForAnswer, disableHumanFeedback)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    message_id,
+                    variables.get("conversationId"),
+                    to_timestamp(variables.get("createdAt")),
+                    variables.get("author"),
+                    variables.get("content") or "",
+                    variables.get("language"),
+                    to_json(variables.get("prompt")),
+                    variables.get("isError"),
+                    variables.get("parentId"),
+                    variables.get("indent"),
+                    variables.get("authorIsUser"),
+                    variables.get("waitForAnswer"),
+                    variables.get("disableHumanFeedback"),
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not create message: {e}")
+            return None
+
+        return message_id
+
+    async def update_message(self, message_id: str, variables: MessageDict) -> bool:
+        try:
+            await self.execute(
+                """UPDATE messages SET author = ?, content = ?, parentId = ?, language = ?,
+                    prompt = ?, disableHumanFeedback = ?
+                WHERE id = ?""",
+                (
+                    variables.get("author"),
+                    variables.get("content") or "",
+                    variables.get("parentId"),
+                    variables.get("language"),
+                    to_json(variables.get("prompt")),
+                    variables.get("disableHumanFeedback"),
+                    message_id,
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update message: {e}")
+            return False
+
+        return True
+
+    async def delete_message(self, message_id: str) -> bool:
+        await self.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+        return True
+
+    async def get_element(
+        self, conversation_id: str, element_id: str
+    ) -> Optional[ElementDict]:
+        row = await self.fetchone(
+            f"""SELECT {", ".join(ELEMENT_COLUMNS)} FROM elements
+            WHERE conversationId = ? AND id = ?""",
+            (conversation_id, element_id),
+        )
+        return self._to_element(row) if row else None
+
+    async def create_element(self, variables: ElementDict) -> Optional[ElementDict]:
+        element = dict(variables)
+        element["id"] = element.get("id") or str(uuid.uuid4())
+        try:
+            await self._write(
+                variables.get("conversationId"),
+                f"""INSERT INTO elements ({", ".join(ELEMENT_COLUMNS)})
+                VALUES ({", ".join("?" for _ in ELEMENT_COLUMNS)})""",
+                [
+                    to_json(element.get(column) or [])
+                    if column == "forIds"
+                    else element.get(column)
+                    for column in ELEMENT_COLUMNS
+                ],
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not create element: {e}")
+            return None
+
+        return element  # type: ignore
+
+    async def update_element(self, variables: ElementDict) -> Optional[ElementDict]:
+        try:
+            await self.execute(
+                "UPDATE elements SET forIds = ? WHERE conversationId = ? AND id = ?",
+                (
+                    to_json(variables.get("forIds") or []),
+                    variables.get("conversationId"),
+                    variables.get("id"),
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update element: {e}")
+            return None
+
+        return variables
+
+    def _conversation_dir(self, conversation_id: Optional[str]) -> str:
+        return os.path.join(self.fs_path, conversation_id or "no_conversation")
+
+    async def upload_element(
+        self,
+        content: Optional[UploadContent],
+        mime: str,
+        conversation_id: Optional[str],
+        path: Optional[str] = None,
+    ) -> Dict:
+        directory = self._conversation_dir(conversation_id)
+        object_key = os.path.relpath(
+            os.path.join(directory, str(uuid.uuid4())), self.fs_path
+        ).replace(os.sep, "/")
+
+        try:
+            await asyncify(os.makedirs)(directory, exist_ok=True)
+            async with aiofiles.open(os.path.join(self.fs_path, object_key), "wb") as f:
+                async for chunk in iter_upload_content(content, path):
+                    await f.write(chunk)
+        except OSError as e:
+            logger.error(f"Failed to upload file: {e}")
+            return {"object_key": None, "url": None}
+
+        return {"object_key": object_key, "url": f"/files/{object_key}"}
@@ -0,0 +1,495 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import aiohttp
+from asyncer import asyncify
+from chainlit.logger import logger
+
+from .base import (
+    AppUser,
+    BaseDBClient,
+    ConversationDict,
+    ConversationFilter,
+    ElementDict,
+    MessageDict,
+    PaginatedResponse,
+    Pagination,
+    PersistedAppUser,
+    UploadContent,
+)
+
+# Errors meaning the backend is unhealthy, as opposed to a rejected request
+TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
+
+# Errors raised before the request reached the backend, the write was not applied
+CONNECTION_ERRORS = (aiohttp.ClientConnectorError, ConnectionRefusedError)
+
+# Writes with the same effect when applied twice. The other ones (the creates) are
+# only replayed if they did not reach the backend: a timed out create may have been applied.
+IDEMPOTENT_WRITES = (
+    "set_human_feedback",
+    "update_message",
+    "delete_message",
+    "update_element",
+)
+
+# Prefix of the conversation ids allocated while the backend is unavailable
+PLACEHOLDER_PREFIX = "spooled-"
+
+# Name, type and description of the metrics served at /metrics
+RESILIENT_METRICS = (
+    ("spool_depth", "gauge", "Writes waiting to be replayed"),
+    ("replay_lag_seconds", "gauge", "Age of the oldest write waiting to be replayed"),
+    (
+        "last_replay_lag_seconds",
+        "gauge",
+        "Age of the last replayed write when it was replayed",
+    ),
+    ("spooled_total", "counter", "Writes spooled while the backend was unavailable"),
+    ("replayed_total", "counter", "Spooled writes replayed"),
+    (
+        "dropped_total",
+        "counter",
+        "Spooled writes rejected by the backend or timed out on replay",
+    ),
+)
+
+
+def is_replayable(op: str, error: Exception) -> bool:
+    """Whether a failed write can be replayed without being applied twice."""
+    return op in IDEMPOTENT_WRITES or isinstance(error, CONNECTION_ERRORS)
+
+
+class PersistenceUnavailableError(Exception):
+    def __init__(self, msg="Data persistence backend is unavailable", *args, **kwargs):
+        super().__init__(msg, *args, **kwargs)
+
+
+class CircuitBreaker:
+    """
+    Stop calling the backend after failure_threshold consecutive failures.
+    After reset_timeout seconds, a trial request is let through (half open):
+    the circuit closes again if it succeeds and re-opens otherwise.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Data persistence backend unhealthy, opening circuit")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class Spool:
+    """
+    Append-only file of the writes waiting to be replayed, one JSON entry per line.
+    Each replayed entry is acknowledged by an appended line, so that an interrupted
+    replay resumes after the last replayed entry. The file is compacted once a replay stops.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Placeholder conversation ids to the ids allocated by the backend on replay
+        self.conversation_ids = {}  # type: Dict[str, str]
+        self.entries = self._load()
+        # Entries appended whose line is not written yet
+        self.unwritten = 0
+        self._lock = None  # type: Optional[asyncio.Lock]
+
+    def _load(self) -> Deque[Dict]:
+        entries = OrderedDict()  # type: OrderedDict[str, Dict]
+        if not os.path.exists(self.path):
+            return deque()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partially written line, the process died while appending
+                    logger.warning("Skipping corrupted persistence spool entry")
+                    continue
+                if "conversation_ids" in record:
+                    self.conversation_ids.update(record["conversation_ids"])
+                elif "ack" in record:
+                    entry = entries.pop(record["ack"], None)
+                    if entry and entry["placeholder"] and record.get("result"):
+                        self.conversation_ids[entry["placeholder"]] = record["result"]
+                else:
+                    entries[record.setdefault("id", str(uuid.uuid4()))] = record
+        return deque(entries.values())
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        # Created on first use to be bound to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def depth(self) -> int:
+        return len(self.entries)
+
+    @property
+    def oldest_timestamp(self) -> Optional[float]:
+        return self.entries[0]["ts"] if self.entries else None
+
+    def _append_lines(self, records: List[Dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _rewrite(self, records: List[Dict]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(tmp_path, self.path)
+
+    async def append(self, entry: Dict):
+        # Queued in memory right away, the lock writes the lines in the same order
+        self.entries.append(entry)
+        self.unwritten += 1
+        try:
+            async with self.lock:
+                await asyncify(self._append_lines)([entry])
+        finally:
+            self.unwritten -= 1
+
+    async def ack(self, result: Any = None):
+        """Acknowledge the replay of the first entry, with the id it allocated."""
+        entry = self.entries[0]
+        record = {"ack": entry["id"]}  # type: Dict[str, Any]
+        if entry["placeholder"] and isinstance(result, str):
+            record["result"] = result
+            self.conversation_ids[entry["placeholder"]] = result
+        async with self.lock:
+            await asyncify(self._append_lines)([record])
+            self.entries.popleft()
+
+    async def compact(self, resolve: Callable[[Any], Any]):
+        """Rewrite the file without the acknowledged entries, with their placeholder ids resolved."""
+        async with self.lock:
+            # The entries whose append waits for the lock are written after the rewrite
+            written = list(self.entries)[: len(self.entries) - self.unwritten]
+            for entry in written:
+                entry["args"] = [resolve(arg) for arg in entry["args"]]
+            records = [{"conversation_ids": self.conversation_ids}] + written
+            await asyncify(self._rewrite)(records)
+
+
+class ResilientClient(BaseDBClient):
+    """
+    Wrap a persistence client with a circuit breaker.
+    When the backend is slow or down, reads fail fast and writes are spooled
+    to a local file. The spooled writes are replayed in order once it recovers.
+    A create that timed out is not spooled, it may have been applied by the backend.
+    Element uploads are not spooled, they fail fast without an url. Their duration
+    depends on the file size, so they have their own timeout and are not counted by
+    the circuit breaker.
+    """
+
+    def __init__(
+        self,
+        client: BaseDBClient,
+        spool_path: str,
+        timeout: float = 10,
+        upload_timeout: float = 600,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.upload_timeout = upload_timeout
+        self.breaker = CircuitBreaker(
+            failure_threshold=failure_threshold, reset_timeout=reset_timeout
+        )
+        self.spool = Spool(spool_path)
+        self.lazy_conversations = client.lazy_conversations
+        self.content_index = client.content_index
+        self.conversation_ids = self.spool.conversation_ids
+
+        self.replay_task = None  # type: Optional[asyncio.Task]
+        self.spooled_total = 0
+        self.replayed_total = 0
+        self.dropped_total = 0
+        self.last_replay_lag = 0.0
+
+        if self.spool.depth:
+            logger.info(
+                f"{self.spool.depth} spooled persistence writes will be replayed"
+            )
+
+    def metrics(self) -> Dict[str, Any]:
+        oldest = self.spool.oldest_timestamp
+        return {
+            "circuit_state": self.breaker.state,
+            "spool_depth": self.spool.depth,
+            # Age of the oldest write waiting to be replayed
+            "replay_lag_seconds": time.time() - oldest if oldest else 0.0,
+            # Age of the last replayed write when it was replayed
+            "last_replay_lag_seconds": self.last_replay_lag,
+            "spooled_total": self.spooled_total,
+            "replayed_total": self.replayed_total,
+            "dropped_total": self.dropped_total,
+        }
+
+    def to_prometheus(self) -> str:
+        metrics = self.metrics()
+        lines = [
+            "# HELP chainlit_persistence_circuit_state State of the persistence circuit breaker",
+            "# TYPE chainlit_persistence_circuit_state gauge",
+        ]
+        for state in ("closed", "half_open", "open"):
+            value = int(metrics["circuit_state"] == state)
+            lines.append(
+                f'chainlit_persistence_circuit_state{{state="{state}"}} {value}'
+            )
+        for name, kind, description in RESILIENT_METRICS:
+            metric = f"chainlit_persistence_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {metrics[name]}")
+        return "\n".join(lines) + "\n"
+
+    def register_conversation(
+        self, conversation_id: str, app_user_id: Optional[str], tags: List[str]
+    ):
+        self.client.register_conversation(conversation_id, app_user_id, tags)
+
+    def unregister_conversation(self, conversation_id: str):
+        self.client.unregister_conversation(conversation_id)
+
+    def _resolve(self, value: Any) -> Any:
+        """Replace the placeholder conversation ids by the persisted ones."""
+        if isinstance(value, str):
+            return self.conversation_ids.get(value, value)
+        if isinstance(value, dict) and value.get("conversationId"):
+            return {
+                **value,
+                "conversationId": self._resolve(value["conversationId"]),
+            }
+        return value
+
+    async def _call(self, op: str, *args):
+        args = tuple(self._resolve(arg) for arg in args)
+        try:
+            result = await asyncio.wait_for(
+                getattr(self.client, op)(*args), self.timeout
+            )
+        except TRANSIENT_ERRORS:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _read(self, op: str, *args):
+        if not self.breaker.allow_request():
+            raise PersistenceUnavailableError()
+        return await self._call(op, *args)
+
+    async def _write(self, op: str, *args, placeholder: Optional[str] = None):
+        # Writes queue behind the spooled ones to preserve their order
+        if not self.spool.depth and self.breaker.allow_request():
+            try:
+                return True, await self._call(op, *args)
+            except TRANSIENT_ERRORS as e:
+                if not is_replayable(op, e):
+                    logger.error(
+                        f"Failed to {op}, not spooled as the persistence backend may have applied it: {repr(e)}"
+                    )
+                    return True, None
+                logger.warning(f"Spooling {op}, persistence backend error: {repr(e)}")
+
+        await self.spool.append(
+            {
+                "id": str(uuid.uuid4()),
+                "op": op,
+                "args": list(args),
+                "placeholder": placeholder,
+                "ts": time.time(),
+            }
+        )
+        self.spooled_total += 1
+        self._schedule_replay()
+        return False, None
+
+    def _schedule_replay(self):
+        if self.replay_task is None or self.replay_task.done():
+            self.replay_task = asyncio.ensure_future(self._replay_loop())
+
+    async def _replay_loop(self):
+        while self.spool.depth:
+            if self.breaker.allow_request():
+                await self.replay()
+            if self.spool.depth:
+                await asyncio.sleep(min(self.breaker.reset_timeout, 5))
+
+    async def replay(self):
+        """
+        Replay the spooled writes in order, stop at the first transient failure.
+        Each write is acknowledged in the spool as soon as it is replayed.
+        """
+        replayed = 0
+        while self.spool.depth:
+            entry = self.spool.entries[0]
+            result = None
+            try:
+                result = await self._call(entry["op"], *entry["args"])
+            except TRANSIENT_ERRORS as e:
+                if is_replayable(entry["op"], e):
+                    break
+                logger.error(
+                    f"Dropping spooled {entry['op']}, the persistence backend may have applied it: {repr(e)}"
+                )
+                self.dropped_total += 1
+            except Exception as e:
+                logger.error(f"Dropping spooled {entry['op']}: {repr(e)}")
+                self.dropped_total += 1
+            else:
+                self.replayed_total += 1
+                self.last_replay_lag = time.time() - entry["ts"]
+            await self.spool.ack(result)
+            replayed += 1
+
+        if replayed:
+            # Persist the ids allocated on replay in the remaining entries
+            await self.spool.compact(self._resolve)
+            if not self.spool.depth:
+                logger.info("Spooled persistence writes replayed")
+
+    def start_replay(self):
+        """Replay the writes spooled by a previous run, if any."""
+        if self.spool.depth:
+            self._schedule_replay()
+
+    async def create_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
+        return await self._read("create_app_user", app_user)
+
+    async def update_app_user(self, app_user: AppUser) -> Optional[PersistedAppUser]:
+        return await self._read("update_app_user", app_user)
+
+    async def get_app_user(self, username: str) -> Optional[PersistedAppUser]:
+        return await self._read("get_app_user", username)
+
+    async def delete_app_user(self, username: str) -> bool:
+        return await self._read("delete_app_user", username)
+
+    async def create_conversation(
+        self, app_user_id: Optional[str], tags: Optional[List[str]]
+    ) -> Optional[str]:
+        placeholder = f"{PLACEHOLDER_PREFIX}{uuid.uuid4()}"
+        done, conversation_id = await self._write(
+            "create_conversation", app_user_id, tags, placeholder=placeholder
+        )
+        return conversation_id if done else placeholder
+
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        return await self._read("delete_conversation", conversation_id)
+
+    async def get_conversation_author(self, conversation_id: str) -> Optional[str]:
+        return await self._read("get_conversation_author", conversation_id)
+
+    async def get_conversation(
+        self, conversation_id: str, first: Optional[int] = None
+    ) -> ConversationDict:
+        return await self._read("get_conversation", conversation_id, first)
+
+    async def get_messages(
+        self, conversation_id: str, pagination: Pagination, latest_first: bool = False
+    ) -> PaginatedResponse[MessageDict]:
+        return await self._read(
+            "get_messages", conversation_id, pagination, latest_first
+        )
+
+    async def get_elements(
+        self,
+        conversation_id: str,
+        pagination: Pagination,
+        for_ids: Optional[List[str]] = None,
+    ) -> PaginatedResponse[ElementDict]:
+        return await self._read("get_elements", conversation_id, pagination, for_ids)
+
+    async def get_conversations(
+        self, pagination: Pagination, filter: ConversationFilter
+    ) -> PaginatedResponse[ConversationDict]:
+        return await self._read("get_conversations", pagination, filter)
+
+    async def set_human_feedback(
+        self, message_id: str, feedback: int, feedbackComment: Optional[str]
+    ) -> bool:
+        done, res = await self._write(
+            "set_human_feedback", message_id, feedback, feedbackComment
+        )
+        return res if done else True
+
+    async def create_message(self, variables: MessageDict) -> Optional[str]:
+        done, res = await self._write("create_message", variables)
+        return res if done else variables.get("id")
+
+    async def update_message(self, message_id: str, variables: MessageDict) -> bool:
+        done, res = await self._write("update_message", message_id, variables)
+        return res if done else True
+
+    async def delete_message(self, message_id: str) -> bool:
+        done, res = await self._write("delete_message", message_id)
+        return res if done else True
+
+    async def get_element(
+        self, conversation_id: str, element_id: str
+    ) -> Optional[ElementDict]:
+        return await self._read("get_element", conversation_id, element_id)
+
+    async def create_element(self, variables: ElementDict) -> Optional[ElementDict]:
+        done, res = await self._write("create_element", variables)
+        return res if done else variables
+
+    async def update_element(self, variables: ElementDict) -> Optional[ElementDict]:
+        done, res = await self._write("update_element", variables)
+        return res if done else variables
+
+    async def upload_element(
+        self,
+        content: Optional[UploadContent],
+        mime: str,
+        conversation_id: Optional[str],
+        path: Optional[str] = None,
+    ) -> Dict:
+        if not self.breaker.allow_request():
+            logger.error(
+                "Failed to upload file: data persistence backend is unavailable"
+            )
+            return {"object_key": None, "url": None}
+
+        try:
+            return await asyncio.wait_for(
+                self.client.upload_element(
+                    content, mime, self._resolve(conversation_id), path
+                ),
+                self.upload_timeout,
+            )
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"Failed to upload file: {repr(e)}")
+            return {"object_key": None, "url": None}
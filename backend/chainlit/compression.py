@@ -0,0 +1,78 @@
+from typing import List, Optional
+
+from chainlit.static_files import available_encodings, compress, negotiate_encoding
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Responses smaller than this (in bytes) are not worth compressing
+MINIMUM_COMPRESSED_SIZE = 1024
+
+
+class JSONCompressionMiddleware:
+    """
+    Compress the JSON responses of the API according to the Accept-Encoding
+    header of the request. Other responses are passed through untouched, so
+    that streamed responses are not buffered.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_COMPRESSED_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()  # type: List[str]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding"), self.encodings
+        )
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None  # type: Optional[Message]
+        body_chunks = []  # type: List[bytes]
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    not content_type.startswith("application/json")
+                    or "content-encoding" in headers
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Wait for the body to know whether to compress it
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            assert start_message
+            body = b"".join(body_chunks)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) >= self.minimum_size:
+                compressed = compress(body, encoding, fast=True)
+                if compressed is not None:
+                    body = compressed
+                    headers["content-encoding"] = encoding
+                    headers["content-length"] = str(len(body))
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,7 +1,7 @@
 import os
 import sys
 from importlib import util
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Literal, Optional
 
 import tomli
 from chainlit.logger import logger
@@ -41,10 +41,36 @@ cache = false
 # Follow symlink for asset mount (see https://github.com/Chainlit/chainlit/issues/317)
 # follow_symlink = false
 
+# Serve the latency histograms of the replies in the Prometheus format at /metrics
+# metrics_endpoint = false
+
+# Persist the conversation history. "local" stores it in a SQLite database in the .chainlit directory,
+# "cloud" stores it in Chainlit cloud (requires CHAINLIT_API_KEY).
+# database = "local"
+
+# Trace the message pipeline with OpenTelemetry, to see where the latency of a reply goes.
+# "otlp" exports the spans to a collector (endpoint defaults to OTEL_EXPORTER_OTLP_ENDPOINT),
+# "file" writes them as JSON lines to file_path (default: .chainlit/traces.jsonl).
+# [project.tracing]
+# exporter = "otlp"
+# endpoint = "http://localhost:4317"
+# sample_rate = 1.0
+
 [features]
 # Show the prompt playground
 prompt_playground = true
 
+# Replay identical prompt playground completions from a cache for this duration (in seconds)
+# prompt_playground_cache_ttl = 3600
+
+# Limit the prompt playground completions sent to each provider, to spare the rate limits of your app.
+# Use a provider id (e.g. "openai-chat") instead of "default" to override the limits of a single provider.
+# [features.prompt_playground_limits.default]
+# max_concurrency = 4
+# requests_per_minute = 60
+# burst = 5
+# queue_timeout = 30
+
 [UI]
 # Name of the app and chatbot.
 name = "Chatbot"
@@ -137,9 +163,26 @@ class Theme(DataClassJsonMixin):
     dark: Optional[Palette] = None
 
 
+@dataclass()
+class PlaygroundProviderLimits(DataClassJsonMixin):
+    # Maximum number of completions streamed at the same time
+    max_concurrency: Optional[int] = None
+    # Sustained rate of completions, bursts of up to `burst` completions are allowed
+    requests_per_minute: Optional[float] = None
+    burst: int = 1
+    # Duration (in seconds) a completion waits for the limits before being rejected
+    queue_timeout: float = 30
+
+
 @dataclass()
 class FeaturesSettings(DataClassJsonMixin):
     prompt_playground: bool = True
+    # Duration (in seconds) during which the prompt playground completions are cached, 0 disables the cache
+    prompt_playground_cache_ttl: int = 0
+    # Maximum number of cached prompt playground completions
+    prompt_playground_cache_size: int = 100
+    # Limits of the prompt playground completions by provider id, "default" applies to the others
+    prompt_playground_limits: Optional[Dict[str, PlaygroundProviderLimits]] = None
 
 
 @dataclass()
@@ -181,6 +224,22 @@ class CodeSettings:
     on_settings_update: Optional[Callable[[Dict[str, Any]], Any]] = None
 
 
+@dataclass()
+class TracingSettings(DataClassJsonMixin):
+    # "otlp" exports the spans to an OpenTelemetry collector, "file" writes them as JSON lines
+    exporter: Literal["otlp", "file"] = "otlp"
+    # OTLP endpoint, defaults to the OTEL_EXPORTER_OTLP_ENDPOINT environment variable
+    endpoint: Optional[str] = None
+    protocol: Literal["grpc", "http/protobuf"] = "grpc"
+    # Headers sent to the OTLP endpoint, e.g. an API key
+    headers: Optional[Dict[str, str]] = None
+    # File the spans are written to with the file exporter
+    file_path: Optional[str] = None
+    service_name: str = "chainlit"
+    # Share of the replies traced
+    sample_rate: float = 1.0
+
+
 @dataclass()
 class ProjectSettings(DataClassJsonMixin):
     enable_telemetry: bool = True
@@ -188,13 +247,22 @@ class ProjectSettings(DataClassJsonMixin):
     user_env: Optional[List[str]] = None
     # Path to the local langchain cache database
     lc_cache_path: Optional[str] = None
+    # Where the conversation history is persisted. Defaults to cloud if CHAINLIT_API_KEY is set.
+    database: Optional[Literal["local", "cloud"]] = None
     # Path to the local chat db
+    local_db_path: Optional[str] = None
+    # Path to the local file system used to store the elements
+    local_fs_path: Optional[str] = None
     # Duration (in seconds) during which the session is saved when the connection is lost
     session_timeout: int = 3600
     # Enable third parties caching (e.g LangChain cache)
     cache: bool = False
     # Follow symlink for asset mount (see https://github.com/Chainlit/chainlit/issues/317)
     follow_symlink: bool = False
+    # Serve the latency histograms of the replies in the Prometheus format at /metrics
+    metrics_endpoint: bool = False
+    # OpenTelemetry tracing of the message pipeline, disabled if not set
+    tracing: Optional[TracingSettings] = None
 
 
 @dataclass()
@@ -266,6 +334,8 @@ def load_settings():
             )
 
         lc_cache_path = os.path.join(config_dir, ".langchain.db")
+        project_config.setdefault("local_db_path", os.path.join(config_dir, "chat.db"))
+        project_config.setdefault("local_fs_path", os.path.join(config_dir, "files"))
 
         project_settings = ProjectSettings(
             lc_cache_path=lc_cache_path,
@@ -305,7 +375,9 @@ def load_config():
     settings = load_settings()
 
     chainlit_server = os.environ.get("CHAINLIT_SERVER", "https://cloud.chainlit.io")
-    data_persistence = "CHAINLIT_API_KEY" in os.environ
+    data_persistence = (
+        "CHAINLIT_API_KEY" in os.environ or settings["project"].database == "local"
+    )
 
     config = ChainlitConfig(
         chainlit_server=chainlit_server,
@@ -1,4 +1,5 @@
 import json
+import os
 import uuid
 from enum import Enum
 from io import BytesIO
@@ -6,10 +7,20 @@ from typing import Any, ClassVar, Dict, List, Optional, TypeVar, Union, cast
 
 import aiofiles
 import filetype
-from chainlit.client.base import ElementDict, ElementDisplay, ElementSize, ElementType
-from chainlit.client.cloud import ChainlitCloudClient, chainlit_client
+from asyncer import asyncify
+from chainlit.auth import sign_url
+from chainlit.client.base import (
+    BaseDBClient,
+    ElementDict,
+    ElementDisplay,
+    ElementSize,
+    ElementType,
+)
+from chainlit.client.cloud import chainlit_client
 from chainlit.context import context
+from chainlit.element_store import ELEMENT_STORE_THRESHOLD, element_store
 from chainlit.telemetry import trace_event
+from chainlit.tracing import start_span
 from pydantic.dataclasses import Field, dataclass
 
 mime_types = {
@@ -22,6 +33,8 @@ mime_types = {
 class Element:
     # The type of the element. This will be used to determine how to display the element in the UI.
     type: ClassVar[ElementType]
+    # Whether the UI can only display the element from its content and not from its url.
+    inline_content: ClassVar[bool] = False
 
     # The ID of the element. This is set automatically when the element is sent to the UI.
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -45,7 +58,7 @@ class Element:
     language: Optional[str] = None
 
     def __post_init__(self) -> None:
-        trace_event(f"init {self.__class__.__name__}")
+        trace_event("init", self.__class__.__name__)
         self.persisted = False
 
         if not self.url and not self.path and not self.content:
@@ -83,20 +96,45 @@ class Element:
         else:
             raise ValueError("Must provide path or content to load element")
 
-    async def persist(self, client: ChainlitCloudClient) -> Optional[ElementDict]:
-        if not self.url and self.content and not self.persisted:
-            # Only guess the mime type when the content is binary
-            mime = (
-                mime_types[self.type]
-                if self.type in mime_types
-                else filetype.guess_mime(self.content)
-            )
+    def guess_mime(self) -> Optional[str]:
+        # Only guess the mime type when the content is binary,
+        # files are sniffed from their header
+        if self.type in mime_types:
+            return mime_types[self.type]
+        return filetype.guess_mime(self.content or self.path)
+
+    async def persist(self, client: BaseDBClient) -> Optional[ElementDict]:
+        if not self.url and (self.content or self.path) and not self.persisted:
             conversation_id = await context.session.get_conversation_id()
-            upload_res = await client.upload_element(
-                content=self.content, mime=mime, conversation_id=conversation_id
-            )
-            self.url = upload_res["url"]
-            self.object_key = upload_res["object_key"]
+            index = client.content_index
+            content_hash = None  # type: Optional[str]
+            stored = None  # type: Optional[Dict]
+            if index:
+                content_hash = await index.hash(self.content or None, self.path)
+                stored = await index.acquire(content_hash, conversation_id, self.id)
+
+            if stored:
+                # Already uploaded, no need to sniff and upload it again
+                self.url = stored["url"]
+                self.object_key = stored["objectKey"]
+            else:
+                upload_res = await client.upload_element(
+                    content=self.content or None,
+                    mime=self.guess_mime() or "application/octet-stream",
+                    conversation_id=conversation_id,
+                    path=self.path,
+                )
+                self.url = upload_res["url"]
+                self.object_key = upload_res["object_key"]
+
+                if index and content_hash and self.object_key:
+                    await index.add(
+                        content_hash,
+                        self.object_key,
+                        self.url,
+                        conversation_id,
+                        self.id,
+                    )
 
         if not self.persisted:
             element_dict = await client.create_element(
@@ -113,13 +151,15 @@ class Element:
         return element
 
     async def remove(self):
-        trace_event(f"remove {self.__class__.__name__}")
+        trace_event("remove", self.__class__.__name__)
         await context.emitter.emit("remove_element", {"id": self.id})
 
     async def send(self, for_id: Optional[str] = None):
-        if not self.content and not self.url and self.path:
-            await self.load()
+        await self.prepare(for_id)
+        await self.emit()
 
+    async def prepare(self, for_id: Optional[str] = None):
+        """Persist the element and load what is needed to display it."""
         await self.preprocess_content()
 
         if for_id and for_id not in self.for_ids:
@@ -127,28 +167,68 @@ class Element:
 
         # We have a client, persist the element
         if chainlit_client:
-            element_dict = await self.persist(chainlit_client)
+            with start_span(
+                "element persist",
+                {"chainlit.element.id": self.id, "chainlit.element.type": self.type},
+            ):
+                element_dict = await self.persist(chainlit_client)
             if element_dict:
                 self.id = element_dict["id"]
 
-        elif not self.url and not self.content:
+        # Contents that could not be uploaded are served over HTTP if too large
+        # to be sent through the websocket, small files are read in memory
+        if not self.url and not self.inline_content:
+            session = context.session
+            username = session.user.username if session.user else None
+            if self.content and len(self.content) > ELEMENT_STORE_THRESHOLD:
+                self.url = await element_store.put_content(
+                    self.content, self.guess_mime(), session.id, username
+                )
+            elif (
+                not self.content
+                and self.path
+                and await asyncify(os.path.getsize)(self.path) > ELEMENT_STORE_THRESHOLD
+            ):
+                self.url = element_store.put_path(
+                    self.path, self.guess_mime(), session.id, username
+                )
+
+        if not self.content and not self.url and self.path:
+            await self.load()
+
+        if not self.url and not self.content:
             raise ValueError("Must provide url or content to send element")
 
+    async def emit(self):
+        """Send the prepared element to the UI."""
         emit_dict = cast(Dict, self.to_dict())
 
-        # Adding this out of to_dict since the dict will be persisted in the DB
-        emit_dict["content"] = self.content
+        # Adding this out of to_dict since the dict will be persisted in the DB.
+        # Large contents are fetched by the UI from their url instead.
+        if (
+            not self.url
+            or self.inline_content
+            or not self.content
+            or len(self.content) <= ELEMENT_STORE_THRESHOLD
+        ):
+            emit_dict["content"] = self.content
+
+        # The UI loads the contents served by the app from their url,
+        # without the Authorization header
+        if self.url:
+            user = context.session.user
+            emit_dict["url"] = sign_url(self.url, user.username if user else None)
 
         if context.emitter.emit:
             # Element was already sent
             if len(self.for_ids) > 1:
-                trace_event(f"update {self.__class__.__name__}")
+                trace_event("update", self.__class__.__name__)
                 await context.emitter.emit(
                     "update_element",
                     {"id": self.id, "forIds": self.for_ids},
                 )
             else:
-                trace_event(f"send {self.__class__.__name__}")
+                trace_event("send", self.__class__.__name__)
                 emit_dict = await self.before_emit(emit_dict)
                 await context.emitter.emit("element", emit_dict)
 
@@ -182,7 +262,7 @@ class Avatar(Element):
         element["content"] = self.content
 
         if context.emitter.emit and element:
-            trace_event(f"send {self.__class__.__name__}")
+            trace_event("send", self.__class__.__name__)
             element = await self.before_emit(element)
             await context.emitter.emit("element", element)
 
@@ -267,6 +347,7 @@ class Task:
 @dataclass
 class TaskList(Element):
     type: ClassVar[ElementType] = "tasklist"
+    inline_content: ClassVar[bool] = True
     tasks: List[Task] = Field(default_factory=list, exclude=True)
     status: str = "Ready"
     name: str = "tasklist"
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from asyncer import asyncify
+from chainlit.config import config_dir
+
+# Element contents larger than this (in bytes) are served over HTTP
+# instead of being sent through the websocket
+ELEMENT_STORE_THRESHOLD = 64 * 1024
+
+# Url the stored contents are served under
+ELEMENT_STORE_ROUTE = "/elements"
+
+# Stored contents not requested for this long (in seconds) are evicted
+ELEMENT_STORE_TTL = 60 * 60
+
+# Maximum number of stored contents, the least recently used are evicted
+ELEMENT_STORE_MAX_ENTRIES = 1000
+
+
+class StoredElement:
+    """File path, mime type and owners of a stored content."""
+
+    __slots__ = ("path", "mime", "owned", "sessions", "usernames", "used_at")
+
+    def __init__(self, path: str, mime: Optional[str], owned: bool):
+        self.path = path
+        self.mime = mime
+        # Whether the file was written by the store, registered files are not deleted
+        self.owned = owned
+        self.sessions = set()  # type: Set[str]
+        self.usernames = set()  # type: Set[str]
+        self.used_at = time.monotonic()
+
+
+class ElementStore:
+    """
+    Local store of the element contents served by the /elements endpoint.
+    In memory contents are written to disk under their hash, files are served
+    from their own path. A content is only served to the users of the sessions
+    it was stored for, and dropped once they all ended, after ttl seconds without
+    being requested or when max_entries is reached (least recently used first).
+    The store is emptied when the server starts.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = ELEMENT_STORE_TTL,
+        max_entries: int = ELEMENT_STORE_MAX_ENTRIES,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Stored keys to their content, least recently used first
+        self.entries = OrderedDict()  # type: OrderedDict[str, StoredElement]
+        # Registered file paths to their key
+        self.path_keys = {}  # type: Dict[str, str]
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.entries.clear()
+        self.path_keys.clear()
+
+    def _write(self, key: str, content: bytes) -> str:
+        file_path = os.path.join(self.directory, key)
+        if not os.path.exists(file_path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, file_path)
+        return file_path
+
+    def _use(
+        self,
+        key: str,
+        entry: StoredElement,
+        session_id: Optional[str] = None,
+        username: Optional[str] = None,
+    ):
+        entry.used_at = time.monotonic()
+        if session_id:
+            entry.sessions.add(session_id)
+        if username:
+            entry.usernames.add(username)
+        self.entries.move_to_end(key)
+
+    def _pop(self, key: str) -> StoredElement:
+        entry = self.entries.pop(key)
+        if not entry.owned:
+            self.path_keys.pop(entry.path, None)
+        return entry
+
+    def _delete_files(self, entries: List[StoredElement]):
+        paths = [entry.path for entry in entries if entry.owned]
+        if not paths:
+            return
+
+        def delete():
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        try:
+            asyncio.get_running_loop().run_in_executor(None, delete)
+        except RuntimeError:
+            delete()
+
+    def _evict(self):
+        expired_at = time.monotonic() - self.ttl
+        evicted = []
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_entries and entry.used_at >= expired_at:
+                break
+            evicted.append(self._pop(key))
+        self._delete_files(evicted)
+
+    async def put_content(
+        self,
+        content: Union[bytes, str],
+        mime: Optional[str] = None,
+        session_id: Optional[str] = None,
+        username: Optional[str] = None,
+    ) -> str:
+        """Store an in memory content for a session and return its url."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        key = hashlib.sha256(content).hexdigest()
+        if key not in self.entries:
+            file_path = await asyncify(self._write)(key, content)
+            self.entries.setdefault(key, StoredElement(file_path, mime, owned=True))
+        self._use(key, self.entries[key], session_id, username)
+        self._evict()
+        return f"{ELEMENT_STORE_ROUTE}/{key}"
+
+    def put_path(
+        self,
+        path: str,
+        mime: Optional[str] = None,
+        session_id: Optional[str] = None,
+        username: Optional[str] = None,
+    ) -> str:
+        """Serve a file from its path to a session and return its url."""
+        path = os.path.abspath(path)
+        key = self.path_keys.get(path)
+        if not key:
+            key = uuid.uuid4().hex
+            self.path_keys[path] = key
+            self.entries[key] = StoredElement(path, mime, owned=False)
+        self.entries[key].mime = mime
+        self._use(key, self.entries[key], session_id, username)
+        self._evict()
+        return f"{ELEMENT_STORE_ROUTE}/{key}"
+
+    def get(
+        self, key: str, username: Optional[str] = None
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        Return the file path and mime type of a stored content.
+        If a username is given, the content must have been stored for that user.
+        """
+        self._evict()
+        entry = self.entries.get(key)
+        if entry is None or (username is not None and username not in entry.usernames):
+            return None
+        self._use(key, entry)
+        return entry.path, entry.mime
+
+    def is_immutable(self, key: str) -> bool:
+        """Contents stored under their hash never change, unlike registered files."""
+        entry = self.entries.get(key)
+        return entry is not None and entry.owned
+
+    def release_session(self, session_id: str):
+        """Drop the contents that were only stored for a session that ended."""
+        released = []
+        for key, entry in list(self.entries.items()):
+            if session_id in entry.sessions:
+                entry.sessions.discard(session_id)
+                if not entry.sessions:
+                    released.append(self._pop(key))
+        self._delete_files(released)
+
+
+element_store = ElementStore(os.path.join(config_dir, "elements"))
@@ -162,7 +162,8 @@ class ChainlitEmitter(BaseChainlitEmitter):
             # We have to update the UI with the actual DB ID
             ui_message_update = cast(Dict, message_dict.copy())
             persisted_id = await chainlit_client.create_message(message_dict)
-            if persisted_id:
+            self.session.invalidate_conversations_cache()
+            if persisted_id and persisted_id != message_dict["id"]:
                 message_dict["id"] = persisted_id
                 ui_message_update["newId"] = message_dict["id"]
                 await self.update_message(ui_message_update)
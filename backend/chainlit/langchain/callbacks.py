@@ -6,6 +6,7 @@ from chainlit.context import context
 from chainlit.message import ErrorMessage, Message
 from chainlit.prompt import Prompt, PromptMessage
 from chainlit.sync import run_sync
+from chainlit.tracing import RunSpans
 from langchain.callbacks.base import AsyncCallbackHandler, BaseCallbackHandler
 from langchain.schema import AgentAction, AgentFinish, BaseMessage, LLMResult
 
@@ -40,6 +41,15 @@ def get_llm_settings(invocation_params: Union[Dict, None], serialized: Dict[str,
     return provider, settings
 
 
+def get_llm_usage(response: LLMResult) -> Dict[str, Any]:
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return {
+        f"chainlit.llm.{key}": value
+        for key, value in token_usage.items()
+        if isinstance(value, int)
+    }
+
+
 def build_prompt(serialized: Dict[str, Any], inputs: Dict[str, Any]):
     prompt_params = serialized.get("kwargs", {}).get("prompt", {}).get("kwargs", {})
     _messages = prompt_params.get("messages")
@@ -132,6 +142,8 @@ class BaseLangchainCallbackHandler(BaseCallbackHandler):
     strip_tokens: bool
     # Should answer prefix itself also be streamed?
     stream_prefix: bool
+    # Spans of the LLM, chain and tool runs, if tracing is enabled
+    run_spans: RunSpans
 
     raise_error = True
 
@@ -150,6 +162,7 @@ class BaseLangchainCallbackHandler(BaseCallbackHandler):
         self.sequence = []
         self.prompt_sequence = []
         self.stream = None
+        self.run_spans = RunSpans()
 
         if root_message:
             self.root_message = root_message
@@ -289,6 +302,12 @@ def _on_chat_model_start(
 ):
     invocation_params = kwargs.get("invocation_params")
     provider, settings = get_llm_settings(invocation_params, serialized)
+    self.run_spans.start(
+        kwargs.get("run_id"),
+        "llm",
+        kwargs.get("parent_run_id"),
+        {"chainlit.llm.provider": provider or ""},
+    )
 
     formatted_messages = messages[0]
 
@@ -366,6 +385,12 @@ def _on_llm_start(
 ) -> None:
     invocation_params = kwargs.get("invocation_params")
     provider, settings = get_llm_settings(invocation_params, serialized)
+    self.run_spans.start(
+        kwargs.get("run_id"),
+        "llm",
+        kwargs.get("parent_run_id"),
+        {"chainlit.llm.provider": provider or ""},
+    )
 
     if self.current_prompt:
         self.current_prompt.formatted = prompts[0]
@@ -381,7 +406,8 @@ def _on_llm_start(
 
 
 class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler):
-    def on_error(self, error, **_):
+    def on_error(self, error, **kwargs):
+        self.run_spans.end(kwargs.get("run_id"), error=error)
         if error := self.create_error(error):
             run_sync(error.send())
             self.pop_sequence()
@@ -440,6 +466,7 @@ class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler
             self.answer_reached = self.check_if_answer_reached()
 
     def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.run_spans.end(kwargs.get("run_id"), attributes=get_llm_usage(response))
         if response.llm_output is not None:
             if "token_usage" in response.llm_output:
                 token_usage = response.llm_output["token_usage"]
@@ -455,6 +482,11 @@ class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler
     def on_chain_start(
         self, serialized: Dict[str, Any], inputs: Dict[str, Any], **kwargs: Any
     ) -> None:
+        self.run_spans.start(
+            kwargs.get("run_id"),
+            f"chain {serialized['id'][-1]}",
+            kwargs.get("parent_run_id"),
+        )
         prompt = build_prompt(serialized, inputs)
         self.prompt_sequence.append(prompt)
         message = self.create_message(author=serialized["id"][-1])
@@ -462,6 +494,7 @@ class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler
         self.add_message(message)
 
     def on_chain_end(self, outputs: Dict[str, Any], **kwargs: Any) -> None:
+        self.run_spans.end(kwargs.get("run_id"))
         output_key = list(outputs.keys())[0]
         if output_key:
             parent_id = self.get_last_message().parent_id
@@ -477,6 +510,11 @@ class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler
     def on_tool_start(
         self, serialized: Dict[str, Any], input_str: str, **kwargs: Any
     ) -> None:
+        self.run_spans.start(
+            kwargs.get("run_id"),
+            f"tool {serialized['name']}",
+            kwargs.get("parent_run_id"),
+        )
         message = self.create_message(author=serialized["name"])
         self.add_in_sequence(message)
         self.add_message(message)
@@ -488,6 +526,7 @@ class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler
         llm_prefix: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
+        self.run_spans.end(kwargs.get("run_id"))
         parent_id = self.get_last_message().parent_id
         message = self.create_message(output, None, parent_id=parent_id)
         self.add_message(message)
@@ -505,7 +544,8 @@ class LangchainCallbackHandler(BaseLangchainCallbackHandler, BaseCallbackHandler
 
 
 class AsyncLangchainCallbackHandler(BaseLangchainCallbackHandler, AsyncCallbackHandler):
-    async def on_error(self, error, **_):
+    async def on_error(self, error, **kwargs):
+        self.run_spans.end(kwargs.get("run_id"), error=error)
         if error := self.create_error(error):
             await error.send()
             self.pop_sequence()
@@ -564,6 +604,7 @@ class AsyncLangchainCallbackHandler(BaseLangchainCallbackHandler, AsyncCallbackH
             self.answer_reached = self.check_if_answer_reached()
 
     async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.run_spans.end(kwargs.get("run_id"), attributes=get_llm_usage(response))
         if response.llm_output is not None:
             if "token_usage" in response.llm_output:
                 token_usage = response.llm_output["token_usage"]
@@ -579,6 +620,11 @@ class AsyncLangchainCallbackHandler(BaseLangchainCallbackHandler, AsyncCallbackH
     async def on_chain_start(
         self, serialized: Dict[str, Any], inputs: Dict[str, Any], **kwargs: Any
     ) -> None:
+        self.run_spans.start(
+            kwargs.get("run_id"),
+            f"chain {serialized['id'][-1]}",
+            kwargs.get("parent_run_id"),
+        )
         prompt = build_prompt(serialized, inputs)
         self.prompt_sequence.append(prompt)
         message = self.create_message(author=serialized["id"][-1])
@@ -586,6 +632,7 @@ class AsyncLangchainCallbackHandler(BaseLangchainCallbackHandler, AsyncCallbackH
         await self.add_message(message)
 
     async def on_chain_end(self, outputs: Dict[str, Any], **kwargs: Any) -> None:
+        self.run_spans.end(kwargs.get("run_id"))
         output_key = list(outputs.keys())[0]
         if output_key:
             parent_id = self.get_last_message().parent_id
@@ -600,6 +647,11 @@ class AsyncLangchainCallbackHandler(BaseLangchainCallbackHandler, AsyncCallbackH
     async def on_tool_start(
         self, serialized: Dict[str, Any], input_str: str, **kwargs: Any
     ) -> None:
+        self.run_spans.start(
+            kwargs.get("run_id"),
+            f"tool {serialized['name']}",
+            kwargs.get("parent_run_id"),
+        )
         message = self.create_message(author=serialized["name"])
         self.add_in_sequence(message)
         await self.add_message(message)
@@ -611,6 +663,7 @@ class AsyncLangchainCallbackHandler(BaseLangchainCallbackHandler, AsyncCallbackH
         llm_prefix: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
+        self.run_spans.end(kwargs.get("run_id"))
         parent_id = self.get_last_message().parent_id
         message = self.create_message(output, parent_id=parent_id)
         await self.add_message(message)
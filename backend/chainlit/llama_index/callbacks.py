@@ -5,6 +5,7 @@ from chainlit.context import context_var
 from chainlit.element import Text
 from chainlit.message import Message
 from chainlit.prompt import Prompt, PromptMessage
+from chainlit.tracing import RunSpans
 from llama_index.callbacks.base import BaseCallbackHandler
 from llama_index.callbacks.schema import CBEventType, EventPayload
 from llama_index.llms.base import ChatMessage, ChatResponse, CompletionResponse
@@ -31,6 +32,8 @@ class LlamaIndexCallbackHandler(BaseCallbackHandler):
         self.context = context_var.get()
         self.event_starts_to_ignore = tuple(event_starts_to_ignore)
         self.event_ends_to_ignore = tuple(event_ends_to_ignore)
+        # Spans of the events, if tracing is enabled
+        self.run_spans = RunSpans()
 
     def _restore_context(self) -> None:
         """Restore Chainlit context in the current thread
@@ -60,6 +63,7 @@ class LlamaIndexCallbackHandler(BaseCallbackHandler):
     ) -> str:
         """Run when an event starts and return id of event."""
         self._restore_context()
+        self.run_spans.start(event_id, event_type.value, kwargs.get("parent_id"))
         asyncio.run(
             Message(
                 content="",
@@ -78,6 +82,7 @@ class LlamaIndexCallbackHandler(BaseCallbackHandler):
         **kwargs: Any,
     ) -> None:
         """Run when an event ends."""
+        self.run_spans.end(event_id)
         if payload is None:
             return
 
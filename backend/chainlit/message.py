@@ -1,3 +1,4 @@
+import asyncio
 import json
 import uuid
 from abc import ABC, abstractmethod
@@ -15,21 +16,44 @@ from chainlit.prompt import Prompt
 from chainlit.telemetry import trace_event
 from chainlit.types import AskFileResponse, AskFileSpec, AskResponse, AskSpec
 
+# Maximum number of elements of a message persisted concurrently
+MAX_CONCURRENT_ELEMENTS = 8
+
 
 class MessageBase(ABC):
+    # Slotted to save the dict of each message, the subclasses declaring
+    # their own __slots__ have no __dict__ either
+    __slots__ = (
+        "id",
+        "author",
+        "content",
+        "streaming",
+        "created_at",
+        "fail_on_persist_error",
+        "persisted",
+        "__weakref__",
+    )
+
     id: str
     author: str
-    content: str = ""
-    streaming = False
-    created_at: Union[int, str, None] = None
-    fail_on_persist_error: bool = False
-    persisted = False
+    content: str
+    streaming: bool
+    created_at: Union[int, str, None]
+    fail_on_persist_error: bool
+    persisted: bool
 
     def __post_init__(self) -> None:
-        trace_event(f"init {self.__class__.__name__}")
+        trace_event("init", self.__class__.__name__)
+        # Slots cannot have class level defaults
+        self.streaming = False
+        self.persisted = False
+        if not hasattr(self, "content"):
+            self.content = ""
+        if not hasattr(self, "fail_on_persist_error"):
+            self.fail_on_persist_error = False
         if not getattr(self, "id", None):
             self.id = str(uuid.uuid4())
-        if not self.created_at:
+        if not getattr(self, "created_at", None):
             self.created_at = datetime.now(timezone.utc).isoformat()
 
     @abstractmethod
@@ -46,6 +70,7 @@ class MessageBase(ABC):
         if chainlit_client and not self.persisted:
             try:
                 persisted_id = await chainlit_client.create_message(msg_dict)
+                context.session.invalidate_conversations_cache()
                 if persisted_id:
                     msg_dict["id"] = persisted_id
                     self.id = persisted_id
@@ -72,6 +97,7 @@ class MessageBase(ABC):
 
         if chainlit_client and self.id:
             await chainlit_client.update_message(self.id, msg_dict)
+            context.session.invalidate_conversations_cache()
 
         await context.emitter.update_message(msg_dict)
 
@@ -86,6 +112,7 @@ class MessageBase(ABC):
 
         if chainlit_client and self.id:
             await chainlit_client.delete_message(self.id)
+            context.session.invalidate_conversations_cache()
 
         await context.emitter.delete_message(self.to_dict())
 
@@ -146,6 +173,16 @@ class Message(MessageBase):
         disable_human_feedback (bool, optional): Hide the feedback buttons for this specific message
     """
 
+    __slots__ = (
+        "language",
+        "prompt",
+        "parent_id",
+        "indent",
+        "actions",
+        "elements",
+        "disable_human_feedback",
+    )
+
     def __init__(
         self,
         content: Union[str, Dict],
@@ -234,8 +271,7 @@ class Message(MessageBase):
         for action in self.actions:
             await action.send(for_id=str(id))
 
-        for element in self.elements:
-            await element.send(for_id=str(id))
+        await self._send_elements(self.elements, for_id=str(id))
 
         return id
 
@@ -254,11 +290,30 @@ class Message(MessageBase):
         for action in actions_to_update:
             await action.send(for_id=self.id)
 
-        for element in elements_to_update:
-            await element.send(for_id=self.id)
+        await self._send_elements(elements_to_update, for_id=self.id)
 
         return True
 
+    async def _send_elements(self, elements: List[ElementBased], for_id: str):
+        """
+        Persist the elements concurrently. They are still sent to the UI in order,
+        each one as soon as it and the previous ones are ready.
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_ELEMENTS)
+
+        async def prepare(element: ElementBased):
+            async with semaphore:
+                await element.prepare(for_id=for_id)
+
+        tasks = [asyncio.ensure_future(prepare(element)) for element in elements]
+        try:
+            for element, task in zip(elements, tasks):
+                await task
+                await element.emit()
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def remove_actions(self):
         for action in self.actions:
             await action.remove()
@@ -276,6 +331,8 @@ class ErrorMessage(MessageBase):
         indent (int, optional): If positive, the message will be nested in the UI.
     """
 
+    __slots__ = ("parent_id", "indent")
+
     def __init__(
         self,
         content: str,
@@ -313,6 +370,8 @@ class ErrorMessage(MessageBase):
 
 
 class AskMessageBase(MessageBase):
+    __slots__ = ()
+
     async def remove(self):
         removed = await super().remove()
         if removed:
@@ -333,6 +392,8 @@ class AskUserMessage(AskMessageBase):
         raise_on_timeout (bool, optional): Whether to raise a socketio TimeoutError if the user does not answer in time.
     """
 
+    __slots__ = ("timeout", "disable_human_feedback", "raise_on_timeout")
+
     def __init__(
         self,
         content: str,
@@ -397,6 +458,15 @@ class AskFileMessage(AskMessageBase):
         raise_on_timeout (bool, optional): Whether to raise a socketio TimeoutError if the user does not answer in time.
     """
 
+    __slots__ = (
+        "max_size_mb",
+        "max_files",
+        "accept",
+        "timeout",
+        "raise_on_timeout",
+        "disable_human_feedback",
+    )
+
     def __init__(
         self,
         content: str,
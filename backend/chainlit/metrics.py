@@ -0,0 +1,235 @@
+"""
+Latency and throughput histograms of the replies, global and per session.
+
+    from chainlit.metrics import reply_metrics
+
+    reply_metrics.snapshot()  # All the sessions
+    reply_metrics.snapshot(session_id)
+
+The global histograms are also served in the Prometheus text format at
+/metrics when `metrics_endpoint` is enabled in the [project] config.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds of the buckets
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Name, description and buckets of the histograms of a reply
+REPLY_HISTOGRAMS = (
+    (
+        "time_to_first_token_seconds",
+        "Time from the user message to the first streamed token (or message) of the reply",
+        LATENCY_BUCKETS,
+    ),
+    (
+        "reply_duration_seconds",
+        "Time from the user message to the end of the reply",
+        LATENCY_BUCKETS,
+    ),
+    (
+        "reply_tokens",
+        "Tokens streamed by a reply",
+        COUNT_BUCKETS,
+    ),
+    (
+        "reply_emits",
+        "Socket.io events emitted by a reply",
+        COUNT_BUCKETS,
+    ),
+    (
+        "reply_persistence_seconds",
+        "Time spent in data persistence calls by a reply",
+        LATENCY_BUCKETS,
+    ),
+    (
+        "reply_queue_wait_seconds",
+        "Time from the user message to the start of the on_message callback",
+        LATENCY_BUCKETS,
+    ),
+)  # type: Tuple[Tuple[str, str, Sequence[float]], ...]
+
+
+class Histogram:
+    """Fixed buckets histogram, like the Prometheus ones."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation in its bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - cumulative) / count
+                return min(value, self.max)
+            cumulative += count
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+    def to_prometheus(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+def _new_histograms() -> Dict[str, Histogram]:
+    return {name: Histogram(buckets) for name, _, buckets in REPLY_HISTOGRAMS}
+
+
+class Reply:
+    """Measures of a reply in progress."""
+
+    __slots__ = (
+        "received_at",
+        "started_at",
+        "first_token_at",
+        "first_message_at",
+        "tokens",
+        "emits",
+        "persistence_time",
+    )
+
+    def __init__(self, received_at: float):
+        self.received_at = received_at
+        self.started_at = None  # type: Optional[float]
+        self.first_token_at = None  # type: Optional[float]
+        self.first_message_at = None  # type: Optional[float]
+        self.tokens = 0
+        self.emits = 0
+        self.persistence_time = 0.0
+
+    def measures(self, ended_at: float) -> Dict[str, float]:
+        first_token_at = self.first_token_at or self.first_message_at
+        measures = {
+            "reply_duration_seconds": ended_at - self.received_at,
+            "reply_tokens": self.tokens,
+            "reply_emits": self.emits,
+            "reply_persistence_seconds": self.persistence_time,
+        }
+        if first_token_at is not None:
+            measures["time_to_first_token_seconds"] = first_token_at - self.received_at
+        if self.started_at is not None:
+            measures["reply_queue_wait_seconds"] = self.started_at - self.received_at
+        return measures
+
+
+class ReplyMetrics:
+    """Histograms of the replies to the user messages, global and per session."""
+
+    def __init__(self):
+        self.histograms = _new_histograms()
+        self.session_histograms = {}  # type: Dict[str, Dict[str, Histogram]]
+        # Replies in progress by session id
+        self.replies = {}  # type: Dict[str, Reply]
+
+    def start_reply(self, session_id: str, received_at: Optional[float] = None):
+        reply = Reply(received_at or time.monotonic())
+        self.replies[session_id] = reply
+        return reply
+
+    def end_reply(self, session_id: str, reply: Reply):
+        if self.replies.get(session_id) is reply:
+            self.replies.pop(session_id)
+
+        if session_id not in self.session_histograms:
+            self.session_histograms[session_id] = _new_histograms()
+        session_histograms = self.session_histograms[session_id]
+
+        for name, value in reply.measures(time.monotonic()).items():
+            self.histograms[name].observe(value)
+            session_histograms[name].observe(value)
+
+    def record_emit(self, session_id: str, event: str):
+        if reply := self.replies.get(session_id):
+            reply.emits += 1
+            if event == "stream_token":
+                reply.tokens += 1
+                if reply.first_token_at is None:
+                    reply.first_token_at = time.monotonic()
+            elif event == "new_message" and reply.first_message_at is None:
+                reply.first_message_at = time.monotonic()
+
+    def record_persistence(self, session_id: str, duration: float):
+        if reply := self.replies.get(session_id):
+            reply.persistence_time += duration
+
+    def remove_session(self, session_id: str):
+        self.session_histograms.pop(session_id, None)
+
+    def snapshot(self, session_id: Optional[str] = None) -> Dict[str, Dict]:
+        """Summaries of the histograms of a session, or of all the sessions."""
+        if session_id is None:
+            histograms = self.histograms
+        else:
+            histograms = self.session_histograms.get(session_id) or _new_histograms()
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP chainlit_active_replies Replies in progress",
+            "# TYPE chainlit_active_replies gauge",
+            f"chainlit_active_replies {len(self.replies)}",
+        ]
+        for name, description, _ in REPLY_HISTOGRAMS:
+            metric = f"chainlit_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} histogram")
+            lines += self.histograms[name].to_prometheus(metric)
+        return "\n".join(lines) + "\n"
+
+
+reply_metrics = ReplyMetrics()
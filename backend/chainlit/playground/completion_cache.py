@@ -0,0 +1,99 @@
+import hashlib
+import json
+from typing import AsyncIterator, List, Optional, Union
+
+from chainlit.cache import TTLCache
+from chainlit.config import config
+from chainlit.playground.provider import COMPLETION_MEDIA_TYPE, CompletionFailure
+from chainlit.types import CompletionRequest
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+Token = Union[str, bytes]
+
+# Header set on the completions replayed from the cache
+CACHE_STATUS_HEADER = "X-Chainlit-Cache"
+
+_cache = None  # type: Optional[TTLCache[List[Token]]]
+
+
+def get_completion_cache() -> Optional[TTLCache[List[Token]]]:
+    """Return the completion cache, None if it is disabled in the config."""
+    global _cache
+    ttl = config.features.prompt_playground_cache_ttl
+    max_size = config.features.prompt_playground_cache_size
+    if not ttl or max_size <= 0:
+        _cache = None
+    elif _cache is None or _cache.ttl != ttl or _cache.max_size != max_size:
+        # The config was reloaded with different settings
+        _cache = TTLCache(ttl=ttl, max_size=max_size)
+    return _cache
+
+
+def get_cache_key(provider_id: str, request: CompletionRequest) -> str:
+    """Hash what the completion depends on, in a normalized form."""
+    prompt = request.prompt
+    payload = {
+        "provider": provider_id,
+        "template": prompt.template,
+        "formatted": prompt.formatted,
+        "template_format": prompt.template_format,
+        "inputs": prompt.inputs,
+        "messages": [
+            {
+                "role": message.role,
+                "name": message.name,
+                "template": message.template,
+                "formatted": message.formatted,
+            }
+            for message in prompt.messages or []
+        ],
+        "settings": prompt.settings,
+        # Users can bring their own keys and endpoints
+        "user_env": request.userEnv,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def is_cache_bypassed(request: Request) -> bool:
+    cache_control = request.headers.get("cache-control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+async def replay(tokens: List[Token]) -> AsyncIterator[Token]:
+    for token in tokens:
+        yield token
+
+
+def cached_completion_response(tokens: List[Token]) -> StreamingResponse:
+    return StreamingResponse(
+        replay(tokens),
+        media_type=COMPLETION_MEDIA_TYPE,
+        headers={CACHE_STATUS_HEADER: "hit"},
+    )
+
+
+def cache_completion_response(
+    cache: TTLCache[List[Token]], key: str, response: StreamingResponse
+) -> StreamingResponse:
+    """
+    Record the streamed tokens, the completion is cached once fully streamed
+    unless it failed.
+    """
+    body_iterator = response.body_iterator
+
+    async def record():
+        tokens = []  # type: List[Token]
+        failed = False
+        async for token in body_iterator:
+            failed = failed or isinstance(token, CompletionFailure)
+            tokens.append(token)
+            yield token
+        if not failed:
+            cache.set(key, tokens)
+
+    response.body_iterator = record()
+    response.headers[CACHE_STATUS_HEADER] = "miss"
+    return response
@@ -1,29 +1,106 @@
-from typing import Dict
+import json
+import os
+from typing import Dict, List, Optional, Tuple
 
+from chainlit.config import config
 from chainlit.playground.provider import BaseProvider
 from chainlit.playground.providers import (
     Anthropic,
     AzureChatOpenAI,
     AzureOpenAI,
     ChatOpenAI,
-    OpenAI,
     ChatVertexAI,
     GenerationVertexAI,
+    OpenAI,
 )
 
-providers = {
-    AzureChatOpenAI.id: AzureChatOpenAI,
-    AzureOpenAI.id: AzureOpenAI,
-    ChatOpenAI.id: ChatOpenAI,
-    OpenAI.id: OpenAI,
-    Anthropic.id: Anthropic,
-    ChatVertexAI.id: ChatVertexAI,
-    GenerationVertexAI.id: GenerationVertexAI,
-}  # type: Dict[str, BaseProvider]
+
+class ProviderRegistry:
+    """
+    LLM providers indexed by id. The configured providers and their serialized
+    list are cached until a provider is added or the environment changes.
+    """
+
+    def __init__(self, providers: List[BaseProvider]):
+        self.providers = {
+            provider.id: provider for provider in providers
+        }  # type: Dict[str, BaseProvider]
+        self._env_vars = None  # type: Optional[List[str]]
+        self._env_state = None  # type: Optional[Tuple]
+        self._configured = {}  # type: Dict[str, BaseProvider]
+        self._serialized = None  # type: Optional[str]
+
+    def _get_env_state(self) -> Tuple:
+        """What the configuration status depends on, cheap to compute."""
+        if self._env_vars is None:
+            self._env_vars = sorted(
+                {
+                    var
+                    for provider in self.providers.values()
+                    for var in provider.env_vars.values()
+                }
+            )
+        user_env = tuple(config.project.user_env or [])
+        return user_env, tuple(var in os.environ for var in self._env_vars)
+
+    def _refresh(self):
+        env_state = self._get_env_state()
+        if env_state == self._env_state:
+            return
+        self._env_state = env_state
+        self._configured = {
+            id: provider
+            for id, provider in self.providers.items()
+            if provider.is_configured()
+        }
+        self._serialized = None
+
+    def add(self, provider: BaseProvider):
+        self.providers[provider.id] = provider
+        self._env_vars = None
+        self._env_state = None
+
+    def has(self, id: str) -> bool:
+        return id in self.providers
+
+    def get_configured(self, id: str) -> Optional[BaseProvider]:
+        self._refresh()
+        return self._configured.get(id)
+
+    def list_configured(self) -> List[BaseProvider]:
+        self._refresh()
+        return list(self._configured.values())
+
+    def serialize_configured(self) -> str:
+        """The JSON list of the configured providers, as served to the UI."""
+        self._refresh()
+        if self._serialized is None:
+            self._serialized = json.dumps(
+                {"providers": [p.to_dict() for p in self._configured.values()]},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        return self._serialized
+
+
+registry = ProviderRegistry(
+    [
+        AzureChatOpenAI,
+        AzureOpenAI,
+        ChatOpenAI,
+        OpenAI,
+        Anthropic,
+        ChatVertexAI,
+        GenerationVertexAI,
+    ]
+)
+
+# Kept for backward compatibility, use the registry to look providers up
+providers = registry.providers
 
 
 def has_llm_provider(id: str):
-    return id in providers
+    return registry.has(id)
 
 
 def add_llm_provider(provider: BaseProvider):
@@ -31,8 +108,17 @@ def add_llm_provider(provider: BaseProvider):
         raise ValueError(
             f"{provider.name} LLM provider requires the following environment variables: {', '.join(provider.env_vars.values())}"
         )
-    providers[provider.id] = provider
+    registry.add(provider)
+
+
+def get_llm_provider(id: str) -> Optional[BaseProvider]:
+    """Return the provider if it exists and is configured."""
+    return registry.get_configured(id)
 
 
 def get_llm_providers():
-    return [provider for provider in providers.values() if provider.is_configured()]
+    return registry.list_configured()
+
+
+def serialize_llm_providers() -> str:
+    return registry.serialize_configured()
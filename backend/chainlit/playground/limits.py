@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from chainlit.config import PlaygroundProviderLimits, config
+from chainlit.logger import logger
+from chainlit.types import CompletionRequest
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask, BackgroundTasks
+
+if TYPE_CHECKING:
+    from chainlit.playground.provider import BaseProvider
+
+
+class TokenBucket:
+    """
+    Refilled at `rate` tokens per second, up to `capacity` tokens.
+    Waiters are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    async def acquire(self, deadline: float) -> bool:
+        """Take a token, return False if it would not be available by the deadline."""
+        async with self.lock:
+            self._refill()
+            wait = (1 - self.tokens) / self.rate
+            if wait > 0:
+                if time.monotonic() + wait > deadline:
+                    return False
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= 1
+            return True
+
+
+class LimiterSlot:
+    """Concurrency slot held by a completion, released once."""
+
+    def __init__(self, semaphore: Optional[asyncio.Semaphore]):
+        self.semaphore = semaphore
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            if self.semaphore:
+                self.semaphore.release()
+
+
+class ProviderLimiter:
+    """Concurrency cap and rate limit of the completions sent to a provider."""
+
+    def __init__(self, limits: PlaygroundProviderLimits):
+        self.limits = limits
+        self.semaphore = (
+            asyncio.Semaphore(limits.max_concurrency)
+            if limits.max_concurrency
+            else None
+        )
+        self.bucket = (
+            TokenBucket(limits.requests_per_minute / 60, max(limits.burst, 1))
+            if limits.requests_per_minute
+            else None
+        )
+
+    async def acquire(self) -> Optional[LimiterSlot]:
+        """Wait for the limits to allow a completion, return None past the queue timeout."""
+        deadline = time.monotonic() + self.limits.queue_timeout
+
+        if self.semaphore:
+            try:
+                await asyncio.wait_for(
+                    self.semaphore.acquire(), timeout=self.limits.queue_timeout
+                )
+            except asyncio.TimeoutError:
+                return None
+
+        slot = LimiterSlot(self.semaphore)
+        if self.bucket:
+            try:
+                acquired = await asyncio.wait_for(
+                    self.bucket.acquire(deadline),
+                    timeout=max(deadline - time.monotonic(), 0),
+                )
+            except asyncio.TimeoutError:
+                acquired = False
+            except BaseException:
+                slot.release()
+                raise
+            if not acquired:
+                slot.release()
+                return None
+        return slot
+
+
+_limiters = {}  # type: Dict[str, ProviderLimiter]
+
+
+def get_limiter(provider_id: str) -> Optional[ProviderLimiter]:
+    """Return the limiter of a provider, None if it is not limited in the config."""
+    provider_limits = config.features.prompt_playground_limits or {}
+    limits = provider_limits.get(provider_id) or provider_limits.get("default")
+    if not limits:
+        _limiters.pop(provider_id, None)
+        return None
+
+    limiter = _limiters.get(provider_id)
+    if limiter is None or limiter.limits != limits:
+        # The config was reloaded with different limits
+        limiter = _limiters[provider_id] = ProviderLimiter(limits)
+    return limiter
+
+
+def release_after_response(response: StreamingResponse, slot: LimiterSlot):
+    body_iterator = response.body_iterator
+
+    async def stream():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            slot.release()
+
+    response.body_iterator = stream()
+
+    # The stream is never iterated if the client disconnects before it starts
+    if response.background is None:
+        response.background = BackgroundTask(slot.release)
+    else:
+        response.background = BackgroundTasks(
+            [response.background, BackgroundTask(slot.release)]
+        )
+
+
+async def create_limited_completion(
+    provider: "BaseProvider", request: CompletionRequest
+):
+    """
+    Create the completion once the limits of the provider allow it.
+    Streamed completions hold their concurrency slot until they are done.
+    """
+    limiter = get_limiter(provider.id)
+    if not limiter:
+        return await provider.create_completion(request)
+
+    slot = await limiter.acquire()
+    if not slot:
+        logger.warning(f"Prompt playground completion rejected by {provider.id} limits")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many completions sent to {provider.name}, try again later",
+        )
+
+    try:
+        response = await provider.create_completion(request)
+    except BaseException:
+        slot.release()
+        raise
+
+    if isinstance(response, StreamingResponse):
+        release_after_response(response, slot)
+    else:
+        slot.release()
+    return response
@@ -0,0 +1,73 @@
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, TypeVar
+
+from chainlit.logger import logger
+
+T = TypeVar("T")
+
+
+class ClientPool:
+    """
+    Clients of the LLM APIs, reused by the completions so that their
+    connections are kept alive. Clients are keyed by their settings, the
+    least recently used ones are dropped once max_size is reached.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._clients = OrderedDict()  # type: OrderedDict[Hashable, Any]
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._clients:
+                self._clients.move_to_end(key)
+                return self._clients[key]
+
+        # Clients may be slow to create, do not hold the lock meanwhile
+        client = factory()
+
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                # Dropped clients may still be streaming, they are closed
+                # once garbage collected
+                self._clients.popitem(last=False)
+        return client
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._clients.pop(key, None)
+
+    async def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+
+        for client in clients:
+            close = getattr(client, "close", None)
+            if not callable(close):
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.debug(f"Failed to close LLM client: {e}")
+
+
+client_pool = ClientPool()
+
+
+def get_aiohttp_session():
+    """Shared aiohttp session of the SDKs built on aiohttp (openai)."""
+    import aiohttp
+
+    session = client_pool.get("aiohttp", aiohttp.ClientSession)
+    if session.closed:
+        client_pool.discard("aiohttp")
+        session = client_pool.get("aiohttp", aiohttp.ClientSession)
+    return session
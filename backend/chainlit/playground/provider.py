@@ -1,14 +1,25 @@
 import os
-from typing import Any, Dict, List, Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Union
 
+from chainlit import input_widget
 from chainlit.config import config
+from chainlit.playground.template import compile_template
 from chainlit.prompt import Prompt, PromptMessage
 from chainlit.telemetry import trace_event
 from chainlit.types import CompletionRequest
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic.dataclasses import dataclass
 
-from chainlit import input_widget
+# Media type of the streamed completions
+COMPLETION_MEDIA_TYPE = "text/plain; charset=utf-8"
+
+
+class CompletionFailure(str):
+    """
+    Error message streamed in place of the tokens when a completion fails
+    after its response started, so that it is not cached as a completion.
+    """
 
 
 @dataclass
@@ -35,19 +46,35 @@ class BaseProvider:
 
     # Format the template based on the prompt inputs
     def _format_template(self, template: str, prompt: Prompt):
-        if prompt.template_format == "f-string":
-            return template.format(**(prompt.inputs or {}))
-        raise HTTPException(
-            status_code=422, detail=f"Unsupported format {prompt.template_format}"
-        )
+        compiled = compile_template(template, prompt.template_format)
+        return compiled.format(prompt.inputs or {})
+
+    # Check that the inputs of the prompt fill the templates before formatting any
+    def validate_inputs(self, prompt: Prompt, templates: List[Optional[str]]):
+        inputs = prompt.inputs or {}
+        missing = set()  # type: Set[str]
+        for template in templates:
+            if template:
+                compiled = compile_template(template, prompt.template_format)
+                missing.update(compiled.missing_variables(inputs))
+        if missing:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Missing prompt inputs: {', '.join(sorted(missing))}",
+            )
 
     # Create a prompt based on the request
     def create_prompt(self, request: CompletionRequest):
         prompt = request.prompt
-        if prompt.messages:
-            messages = [self.format_message(m, prompt=prompt) for m in prompt.messages]
+        messages = prompt.messages or []
+
+        # Only the messages are formatted if there are any, except for
+        # completion providers which use the prompt template first
+        if messages and (self.is_chat or not prompt.template):
+            self.validate_inputs(prompt, [m.template for m in messages])
+            messages = [self.format_message(m, prompt=prompt) for m in messages]
         else:
-            messages = None
+            self.validate_inputs(prompt, [prompt.template])
 
         if self.is_chat:
             if messages:
@@ -75,10 +102,48 @@ class BaseProvider:
             else:
                 raise HTTPException(status_code=422, detail="Could not create prompt")
 
-    # Create a completion event
+    # Stream the completion tokens as they are generated. Providers only
+    # overriding create_completion are streamed from the body of their response
+    async def stream_completion(self, request: CompletionRequest) -> AsyncIterator[str]:
+        response = await self.create_completion(request)
+        if response is None:
+            raise HTTPException(
+                status_code=501, detail=f"{self.name} does not support completions"
+            )
+
+        if isinstance(response, StreamingResponse):
+            async for chunk in response.body_iterator:
+                yield chunk if isinstance(chunk, str) else bytes(chunk).decode("utf-8")
+        else:
+            yield bytes(response.body).decode("utf-8")
+
+    # Create a completion event and stream the completion
     async def create_completion(self, request: CompletionRequest):
         trace_event("completion")
 
+        # Providers overriding create_completion return their own response
+        if type(self).stream_completion is BaseProvider.stream_completion:
+            return None
+
+        tokens = self.stream_completion(request)
+
+        # Wait for the first token so that the errors raised before the
+        # completion starts (auth, rate limits...) are returned as HTTP errors
+        try:
+            first_token = await tokens.__anext__()  # type: Optional[str]
+        except StopAsyncIteration:
+            first_token = None
+
+        async def create_event_stream():
+            if first_token is not None:
+                yield first_token
+            async for token in tokens:
+                yield token
+
+        return StreamingResponse(
+            create_event_stream(), media_type=COMPLETION_MEDIA_TYPE
+        )
+
     # Get the environment variable based on the request
     def get_var(self, request: CompletionRequest, var: str) -> Union[str, None]:
         user_env = config.project.user_env or []
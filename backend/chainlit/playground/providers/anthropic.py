@@ -1,8 +1,8 @@
 from chainlit.input_widget import Select, Slider, Tags
+from chainlit.playground.pool import client_pool
 from chainlit.playground.provider import BaseProvider
 from chainlit.prompt import PromptMessage
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
 
 
 class AnthropicProvider(BaseProvider):
@@ -23,8 +23,7 @@ class AnthropicProvider(BaseProvider):
             raise HTTPException(status_code=400, detail=f"Got unknown type {message}")
         return message_text
 
-    async def create_completion(self, request):
-        await super().create_completion(request)
+    async def stream_completion(self, request):
         import anthropic
 
         env_settings = self.validate_env(request=request)
@@ -37,7 +36,10 @@ class AnthropicProvider(BaseProvider):
         if not prompt.endswith(anthropic.AI_PROMPT):
             prompt += anthropic.AI_PROMPT
 
-        client = anthropic.AsyncAnthropic(**env_settings)
+        client = client_pool.get(
+            (self.id, tuple(sorted(env_settings.items()))),
+            lambda: anthropic.AsyncAnthropic(**env_settings),
+        )
 
         llm_settings["stream"] = True
 
@@ -55,12 +57,8 @@ class AnthropicProvider(BaseProvider):
         except anthropic.APIStatusError as e:
             raise HTTPException(status_code=e.status_code, detail=e.response)
 
-        async def create_event_stream():
-            async for data in stream:
-                token = data.completion
-                yield token
-
-        return StreamingResponse(create_event_stream())
+        async for data in stream:
+            yield data.completion
 
 
 Anthropic = AnthropicProvider(
@@ -1,10 +1,10 @@
 from typing import Optional
 
 from chainlit.input_widget import Slider
+from chainlit.playground.pool import client_pool
 from chainlit.playground.provider import BaseProvider
 from chainlit.sync import make_async
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
 from pydantic.dataclasses import dataclass
 
 
@@ -13,22 +13,27 @@ class BaseHuggingFaceProvider(BaseProvider):
     repo_id: Optional[str] = None
     task = "text2text-generation"
 
-    async def create_completion(self, request):
-        await super().create_completion(request)
+    async def stream_completion(self, request):
         from huggingface_hub.inference_api import InferenceApi
 
         env_settings = self.validate_env(request=request)
         llm_settings = request.prompt.settings
         self.require_settings(llm_settings)
 
-        client = InferenceApi(
-            repo_id=self.repo_id,
-            token=env_settings["api_token"],
-            task=self.task,
+        if self.task != "text2text-generation":
+            raise HTTPException(status_code=400, detail="Unsupported task")
+
+        token = env_settings["api_token"]
+
+        # Creating the client fetches the model info from the hub
+        client = await make_async(client_pool.get)(
+            (self.id, self.repo_id, self.task, token),
+            lambda: InferenceApi(repo_id=self.repo_id, token=token, task=self.task),
         )
 
         prompt = self.create_prompt(request)
 
+        # The inference API returns the whole generated text at once
         response = await make_async(client)(inputs=prompt, params=llm_settings)
 
         if "error" in response:
@@ -36,14 +41,8 @@ class BaseHuggingFaceProvider(BaseProvider):
                 status_code=500,
                 detail=f"Error raised by inference API: {response['error']}",
             )
-        if client.task == "text2text-generation":
 
-            def create_event_stream():
-                yield response[0]["generated_text"]
-
-            return StreamingResponse(create_event_stream())
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported task")
+        yield response[0]["generated_text"]
 
 
 flan_hf_env_vars = {"api_token": "HUGGINGFACE_API_TOKEN"}
@@ -1,12 +1,9 @@
 from typing import Union
 
-from fastapi.responses import StreamingResponse
-
-from chainlit.playground.provider import BaseProvider
-from chainlit.prompt import PromptMessage
-from chainlit.sync import make_async
-
 from chainlit import input_widget
+from chainlit.playground.provider import BaseProvider, CompletionFailure
+from chainlit.prompt import PromptMessage
+from chainlit.sync import iterate_in_thread
 
 
 class LangchainGenericProvider(BaseProvider):
@@ -60,30 +57,21 @@ class LangchainGenericProvider(BaseProvider):
     def message_to_string(self, message: PromptMessage) -> str:
         return message.to_string()
 
-    async def create_completion(self, request):
+    async def stream_completion(self, request):
         from langchain.schema.messages import BaseMessageChunk
 
-        await super().create_completion(request)
-
         messages = self.create_prompt(request)
 
-        stream = make_async(self.llm.stream)
-
-        result = await stream(
-            input=messages,
-        )
-
-        def create_event_stream():
-            try:
-                for chunk in result:
-                    if isinstance(chunk, BaseMessageChunk):
-                        yield chunk.content
-                    else:
-                        yield chunk
-            except Exception as e:
-                # The better solution would be to return a 500 error, but
-                # langchain raises the error in the stream, and the http
-                # headers have already been sent.
-                yield f"Failed to create completion: {str(e)}"
-
-        return StreamingResponse(create_event_stream())
+        try:
+            async for chunk in iterate_in_thread(
+                lambda: self.llm.stream(input=messages)
+            ):
+                if isinstance(chunk, BaseMessageChunk):
+                    yield chunk.content
+                else:
+                    yield chunk
+        except Exception as e:
+            # The better solution would be to return a 500 error, but
+            # langchain raises the error in the stream, and the http
+            # headers have already been sent.
+            yield CompletionFailure(f"Failed to create completion: {str(e)}")
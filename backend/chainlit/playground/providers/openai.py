@@ -1,9 +1,9 @@
 from contextlib import contextmanager
 
 from chainlit.input_widget import Select, Slider, Tags
+from chainlit.playground.pool import get_aiohttp_session
 from chainlit.playground.provider import BaseProvider
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
 
 openai_common_inputs = [
     Slider(
@@ -108,8 +108,7 @@ class ChatOpenAIProvider(BaseProvider):
         message = super().format_message(message, prompt)
         return message.to_openai()
 
-    async def create_completion(self, request):
-        await super().create_completion(request)
+    async def stream_completion(self, request):
         import openai
 
         env_settings = self.validate_env(request=request)
@@ -136,6 +135,9 @@ class ChatOpenAIProvider(BaseProvider):
 
         llm_settings["stream"] = True
 
+        # Reuse the connections of the previous completions
+        openai.aiosession.set(get_aiohttp_session())
+
         with handle_openai_error():
             response = await openai.ChatCompletion.acreate(
                 **env_settings,
@@ -143,20 +145,15 @@ class ChatOpenAIProvider(BaseProvider):
                 **llm_settings,
             )
 
-        async def create_event_stream():
-            async for stream_resp in response:
-                token = stream_resp.choices[0]["delta"].get("content", "")
-                yield token
-
-        return StreamingResponse(create_event_stream())
+        async for stream_resp in response:
+            yield stream_resp.choices[0]["delta"].get("content", "")
 
 
 class OpenAIProvider(BaseProvider):
     def message_to_string(self, message):
         return message.to_string()
 
-    async def create_completion(self, request):
-        await super().create_completion(request)
+    async def stream_completion(self, request):
         import openai
 
         env_settings = self.validate_env(request=request)
@@ -183,6 +180,9 @@ class OpenAIProvider(BaseProvider):
 
         llm_settings["stream"] = True
 
+        # Reuse the connections of the previous completions
+        openai.aiosession.set(get_aiohttp_session())
+
         with handle_openai_error():
             response = await openai.Completion.acreate(
                 **env_settings,
@@ -190,12 +190,8 @@ class OpenAIProvider(BaseProvider):
                 **llm_settings,
             )
 
-        async def create_event_stream():
-            async for stream_resp in response:
-                token = stream_resp.get("choices")[0].get("text")
-                yield token
-
-        return StreamingResponse(create_event_stream())
+        async for stream_resp in response:
+            yield stream_resp.get("choices")[0].get("text")
 
 
 openai_env_vars = {"api_key": "OPENAI_API_KEY"}
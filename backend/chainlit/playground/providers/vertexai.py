@@ -1,10 +1,8 @@
-import chainlit as cl
-from fastapi import HTTPException
-
-from fastapi.responses import StreamingResponse
-
 from chainlit.input_widget import Select, Slider, Tags
+from chainlit.playground.pool import client_pool
 from chainlit.playground.provider import BaseProvider
+from chainlit.sync import iterate_in_thread
+from fastapi import HTTPException
 
 vertexai_common_inputs = [
     Slider(
@@ -27,68 +25,70 @@ vertexai_common_inputs = [
 
 
 class ChatVertexAIProvider(BaseProvider):
-    async def create_completion(self, request):
-        await super().create_completion(request)
+    async def stream_completion(self, request):
         from vertexai.language_models import ChatModel, CodeChatModel
 
         self.validate_env(request=request)
 
-        llm_settings = request.prompt.settings
+        # Copied, the model is popped from the settings passed to the SDK
+        llm_settings = dict(request.prompt.settings or {})
         self.require_settings(llm_settings)
 
         prompt = self.create_prompt(request)
-        model_name = llm_settings["model"]
+        model_name = llm_settings.pop("model")
         if model_name.startswith("chat-"):
-            model = ChatModel.from_pretrained(model_name)
+            model_class = ChatModel
         elif model_name.startswith("codechat-"):
-            model = CodeChatModel.from_pretrained(model_name)
+            model_class = CodeChatModel
         else:
             raise HTTPException(
                 status_code=400,
                 detail=f"This model{model_name} is not implemented.",
             )
-        del llm_settings["model"]
-        chat = model.start_chat()
 
-        def create_event_stream():
-            for response in cl.make_async(
-                chat.send_message_streaming(prompt[0].formatted, **llm_settings)
-            ):
-                yield response.text
+        # The vertexai SDK is blocking, stream it from a worker thread
+        def send_message_streaming():
+            model = client_pool.get(
+                (self.id, model_name), lambda: model_class.from_pretrained(model_name)
+            )
+            chat = model.start_chat()
+            return chat.send_message_streaming(prompt[0].formatted, **llm_settings)
 
-        return StreamingResponse(create_event_stream())
+        async for response in iterate_in_thread(send_message_streaming):
+            yield response.text
 
 
 class GenerationVertexAIProvider(BaseProvider):
-    async def create_completion(self, request):
-        await super().create_completion(request)
-        from vertexai.language_models import TextGenerationModel, CodeGenerationModel
+    async def stream_completion(self, request):
+        from vertexai.language_models import CodeGenerationModel, TextGenerationModel
 
         self.validate_env(request=request)
 
-        llm_settings = request.prompt.settings
+        # Copied, the model is popped from the settings passed to the SDK
+        llm_settings = dict(request.prompt.settings or {})
         self.require_settings(llm_settings)
 
         prompt = self.create_prompt(request)
-        model_name = llm_settings["model"]
+        model_name = llm_settings.pop("model")
         if model_name.startswith("text-"):
-            model = TextGenerationModel.from_pretrained(model_name)
+            model_class = TextGenerationModel
         elif model_name.startswith("code-"):
-            model = CodeGenerationModel.from_pretrained(model_name)
+            model_class = CodeGenerationModel
         else:
             raise HTTPException(
                 status_code=400,
                 detail=f"This model{model_name} is not implemented.",
             )
-        del llm_settings["model"]
 
-        def create_event_stream():
-            for response in cl.make_async(
-                model.predict_streaming(prompt, **llm_settings)
-            ):
-                yield response.text
+        # The vertexai SDK is blocking, stream it from a worker thread
+        def predict_streaming():
+            model = client_pool.get(
+                (self.id, model_name), lambda: model_class.from_pretrained(model_name)
+            )
+            return model.predict_streaming(prompt, **llm_settings)
 
-        return StreamingResponse(create_event_stream())
+        async for response in iterate_in_thread(predict_streaming):
+            yield response.text
 
 
 gcp_env_vars = {"google_application_credentials": "GOOGLE_APPLICATION_CREDENTIALS"}
@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, FrozenSet, Optional, Set
+
+from fastapi import HTTPException
+
+# Number of compiled templates kept in memory
+TEMPLATE_CACHE_SIZE = 512
+
+_formatter = Formatter()
+
+# Root variable of an f-string field, e.g. "user" for "{user.name}"
+_field_root = re.compile(r"^[^.\[]*")
+
+
+class CompiledTemplate:
+    """Template parsed once, formatted for each completion."""
+
+    variables = frozenset()  # type: FrozenSet[str]
+
+    def missing_variables(self, inputs: Dict[str, Any]) -> FrozenSet[str]:
+        return frozenset(v for v in self.variables if v not in inputs)
+
+    def format(self, inputs: Dict[str, Any]) -> str:
+        raise NotImplementedError()
+
+
+class FStringTemplate(CompiledTemplate):
+    def __init__(self, template: str):
+        try:
+            self.variables = frozenset(self._parse_variables(template))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid template: {e}")
+        self.template = template
+
+    @classmethod
+    def _parse_variables(cls, template: str) -> Set[str]:
+        variables = set()
+        for _, field_name, format_spec, _ in _formatter.parse(template):
+            if field_name is None:
+                continue
+            root = _field_root.match(field_name).group(0)  # type: ignore
+            if not root or root.isdigit():
+                raise ValueError("positional fields are not supported")
+            variables.add(root)
+            if format_spec and "{" in format_spec:
+                variables.update(cls._parse_variables(format_spec))
+        return variables
+
+    def format(self, inputs: Dict[str, Any]) -> str:
+        # The template was validated, format_map does not copy the inputs
+        return self.template.format_map(inputs)
+
+
+class Jinja2Template(CompiledTemplate):
+    def __init__(self, template: str):
+        try:
+            from jinja2 import TemplateSyntaxError, meta
+            from jinja2.sandbox import SandboxedEnvironment
+        except ImportError:
+            raise HTTPException(
+                status_code=422,
+                detail="jinja2 templates require jinja2, install it with `pip install jinja2`",
+            )
+
+        # The templates are user provided
+        environment = SandboxedEnvironment(keep_trailing_newline=True)
+        try:
+            ast = environment.parse(template)
+            self.template = environment.from_string(ast)
+        except TemplateSyntaxError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid template: {e}")
+        self.variables = frozenset(meta.find_undeclared_variables(ast))
+
+    def format(self, inputs: Dict[str, Any]) -> str:
+        return self.template.render(**inputs)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template: str, template_format: Optional[str]) -> CompiledTemplate:
+    """Parse the template, compiled templates are cached by template string."""
+    if template_format == "f-string":
+        return FStringTemplate(template)
+    if template_format == "jinja2":
+        return Jinja2Template(template)
+    raise HTTPException(status_code=422, detail=f"Unsupported format {template_format}")
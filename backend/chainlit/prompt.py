@@ -1,15 +1,50 @@
-from typing import Any, Dict, List, Literal, Optional
+import dataclasses
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from dataclasses_json import DataClassJsonMixin
 from pydantic.dataclasses import dataclass
 
 
+def _copy_json(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, BaseTemplate):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy_json(v) for v in value]
+    return value
+
+
 @dataclass
 class BaseTemplate(DataClassJsonMixin):
     template: Optional[str] = None
     formatted: Optional[str] = None
     template_format: Optional[str] = "f-string"
 
+    # dataclasses_json inspects the fields on every call, which is slow for
+    # prompts with long chat histories. The plain dict conversions are done
+    # from the field names instead, to_json and the schemas are unchanged.
+    @classmethod
+    def _field_names(cls) -> Tuple[str, ...]:
+        names = cls.__dict__.get("_field_names_cache")
+        if names is None:
+            names = tuple(f.name for f in dataclasses.fields(cls))
+            setattr(cls, "_field_names_cache", names)
+        return names
+
+    def to_dict(self, encode_json=False) -> Dict[str, Any]:
+        if encode_json:
+            return super().to_dict(encode_json=encode_json)
+        return {name: _copy_json(getattr(self, name)) for name in self._field_names()}
+
+    @classmethod
+    def from_dict(cls, kvs, *, infer_missing=False):
+        if infer_missing or not isinstance(kvs, dict):
+            return super().from_dict(kvs, infer_missing=infer_missing)
+        return cls(**{name: kvs[name] for name in cls._field_names() if name in kvs})
+
 
 @dataclass
 class PromptMessage(BaseTemplate):
@@ -37,3 +72,13 @@ class Prompt(BaseTemplate):
     completion: Optional[str] = None
     settings: Optional[Dict[str, Any]] = None
     messages: Optional[List[PromptMessage]] = None
+
+    @classmethod
+    def from_dict(cls, kvs, *, infer_missing=False):
+        if not infer_missing and isinstance(kvs, dict) and kvs.get("messages"):
+            kvs = dict(kvs)
+            kvs["messages"] = [
+                PromptMessage.from_dict(m) if isinstance(m, dict) else m
+                for m in kvs["messages"]
+            ]
+        return super().from_dict(kvs, infer_missing=infer_missing)
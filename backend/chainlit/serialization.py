@@ -0,0 +1,39 @@
+import json
+from typing import Any
+
+from engineio import json as engineio_json
+
+
+def _import_orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+orjson = _import_orjson()
+
+
+class WireJSON:
+    """
+    JSON module of the socket.io wire format. Payloads are encoded with orjson
+    when it is installed, the standard json module handles what orjson cannot.
+    """
+
+    @staticmethod
+    def dumps(obj: Any, *args, **kwargs) -> str:
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+            except TypeError:
+                # e.g. integers larger than 64 bits
+                pass
+        return json.dumps(obj, *args, **kwargs)
+
+    @staticmethod
+    def loads(s: Any, *args, **kwargs) -> Any:
+        if orjson is not None and not args and not kwargs:
+            # orjson rejects the integers larger than 64 bits, like engineio
+            return orjson.loads(s)
+        return engineio_json.loads(s, *args, **kwargs)
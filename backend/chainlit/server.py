@@ -1,8 +1,7 @@
-import glob
 import json
 import mimetypes
 import urllib.parse
-from typing import Optional, Union
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 from chainlit.oauth_providers import get_oauth_provider
 from chainlit.secret import random_secret
@@ -16,22 +15,55 @@ import webbrowser
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from chainlit.auth import create_jwt, get_configuration, get_current_user
+from asyncer import asyncify
+from chainlit.auth import (
+    create_jwt,
+    get_configuration,
+    get_current_user,
+    get_url_username,
+    sign_url,
+)
+from chainlit.cache import conversations_cache, invalidate_conversations_cache
 from chainlit.client.acl import is_conversation_author
+from chainlit.client.base import ElementDict, Pagination
 from chainlit.client.cloud import AppUser, PersistedAppUser, chainlit_client
+from chainlit.client.resilient import ResilientClient
+from chainlit.compression import JSONCompressionMiddleware
 from chainlit.config import (
     APP_ROOT,
     BACKEND_ROOT,
     DEFAULT_HOST,
     PACKAGE_ROOT,
     config,
+    config_dir,
     load_module,
     reload_config,
 )
+from chainlit.element_store import ELEMENT_STORE_ROUTE, element_store
 from chainlit.logger import logger
 from chainlit.markdown import get_markdown_str
-from chainlit.playground.config import get_llm_providers
-from chainlit.telemetry import trace_event
+from chainlit.metrics import reply_metrics
+from chainlit.playground.completion_cache import (
+    cache_completion_response,
+    cached_completion_response,
+    get_cache_key,
+    get_completion_cache,
+    is_cache_bypassed,
+)
+from chainlit.playground.config import get_llm_provider, serialize_llm_providers
+from chainlit.playground.limits import create_limited_completion
+from chainlit.playground.pool import client_pool
+from chainlit.serialization import WireJSON
+from chainlit.static_files import (
+    REVALIDATE_CACHE_CONTROL,
+    AssetFiles,
+    PrecompressedContent,
+    PublicAssets,
+    file_signature,
+    serve_static_file,
+)
+from chainlit.telemetry import chainlit_telemetry, trace_event
+from chainlit.tracing import shutdown_tracing
 from chainlit.types import (
     CompletionRequest,
     DeleteConversationRequest,
@@ -40,9 +72,13 @@ from chainlit.types import (
     UpdateFeedbackRequest,
 )
 from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import (
+    JSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.staticfiles import StaticFiles
 from fastapi_socketio import SocketManager
 from starlette.middleware.cors import CORSMiddleware
 from typing_extensions import Annotated
@@ -66,9 +102,37 @@ async def lifespan(app: FastAPI):
         await asyncio.sleep(1)
         webbrowser.open(url)
 
+    if isinstance(chainlit_client, ResilientClient):
+        chainlit_client.start_replay()
+
+    # The stored elements were only served to the sessions of the previous run
+    element_store.clear()
+
+    # Write the .br and .gz files of the built assets in the background
+    precompress_task = asyncio.get_running_loop().run_in_executor(
+        None, asset_files.precompress
+    )
+
     watch_task = None
     stop_event = asyncio.Event()
 
+    async def watch_public_files():
+        public_dir = public_assets.public_dir
+        while not stop_event.is_set():
+            if os.path.isdir(public_dir):
+                async for _ in awatch(public_dir, stop_event=stop_event):
+                    public_assets.resolve()
+            else:
+                # Wait for the public directory to be created
+                async for _ in awatch(
+                    os.path.dirname(public_dir), stop_event=stop_event, recursive=False
+                ):
+                    if os.path.isdir(public_dir):
+                        public_assets.resolve()
+                        break
+
+    public_watch_task = asyncio.create_task(watch_public_files())
+
     if config.run.watch:
 
         async def watch_files_for_changes():
@@ -90,6 +154,8 @@ async def lifespan(app: FastAPI):
                             logger.error(f"Error reloading config: {e}")
                             break
 
+                        invalidate_rendered_responses()
+
                         # Reload the module if the module name is specified in the config
                         if config.run.module_name:
                             try:
@@ -107,13 +173,18 @@ async def lifespan(app: FastAPI):
     try:
         yield
     finally:
-        if watch_task:
-            try:
-                stop_event.set()
-                watch_task.cancel()
-                await watch_task
-            except asyncio.exceptions.CancelledError:
-                pass
+        stop_event.set()
+        for task in [watch_task, public_watch_task, precompress_task]:
+            if task:
+                try:
+                    task.cancel()
+                    await task
+                except asyncio.exceptions.CancelledError:
+                    pass
+
+        await client_pool.close()
+        await asyncify(chainlit_telemetry.shutdown)()
+        await asyncify(shutdown_tracing)()
 
         # Force exit the process to avoid potential AnyIO threads still running
         os._exit(0)
@@ -132,17 +203,18 @@ def get_build_dir():
 
 build_dir = get_build_dir()
 
+public_assets = PublicAssets(os.path.join(APP_ROOT, "public"), build_dir)
+
 app = FastAPI(lifespan=lifespan)
 
-app.mount("/public", StaticFiles(directory="public", check_dir=False), name="public")
-app.mount(
-    "/assets",
-    StaticFiles(
-        packages=[("chainlit", os.path.join(build_dir, "assets"))],
-        follow_symlink=config.project.follow_symlink,
-    ),
-    name="assets",
+app.mount("/public", AssetFiles(directory="public", check_dir=False), name="public")
+asset_files = AssetFiles(
+    packages=[("chainlit", os.path.join(build_dir, "assets"))],
+    follow_symlink=config.project.follow_symlink,
+    hashed_assets=True,
+    cache_dir=os.path.join(config_dir, "assets"),
 )
+app.mount("/assets", asset_files, name="assets")
 
 
 app.add_middleware(
@@ -152,16 +224,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(JSONCompressionMiddleware)
 
 
 # Define max HTTP data size to 100 MB
 max_message_size = 100 * 1024 * 1024
 
+# Page sizes of the lazily loaded conversation messages and elements
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 socket = SocketManager(
     app,
     cors_allowed_origins=[],
     async_mode="asgi",
     max_http_buffer_size=max_message_size,
+    json=WireJSON,
 )
 
 
@@ -197,9 +275,7 @@ def get_html_template():
 
     custom_js = None
     if config.ui.custom_js:
-        custom_js = (
-            f"""<script src="{config.ui.custom_js}"></script>"""
-        )
+        custom_js = f"""<script src="{config.ui.custom_js}"></script>"""
 
     index_html_file_path = os.path.join(build_dir, "index.html")
 
@@ -215,6 +291,55 @@ def get_html_template():
         return content
 
 
+# Responses rendered from the config and their source files on first use,
+# dropped on each config reload or when a source file changes
+rendered_responses = (
+    {}
+)  # type: Dict[str, Tuple[List[Optional[Tuple[int, int]]], PrecompressedContent]]
+
+
+def get_rendered_response(
+    key: str,
+    render: Callable[[], str],
+    media_type: str,
+    sources: Sequence[str] = (),
+) -> PrecompressedContent:
+    signatures = [file_signature(source) for source in sources]
+    rendered = rendered_responses.get(key)
+    if rendered is None or rendered[0] != signatures:
+        rendered = rendered_responses[key] = (
+            signatures,
+            PrecompressedContent(render().encode("utf-8"), media_type=media_type),
+        )
+    return rendered[1]
+
+
+def invalidate_rendered_responses():
+    rendered_responses.clear()
+
+
+def get_html_shell() -> PrecompressedContent:
+    return get_rendered_response(
+        "html_shell",
+        get_html_template,
+        "text/html",
+        sources=[os.path.join(build_dir, "index.html")],
+    )
+
+
+def get_project_settings() -> str:
+    return json.dumps(
+        {
+            "ui": config.ui.to_dict(),
+            "userEnv": config.project.user_env,
+            "dataPersistence": config.data_persistence,
+            "markdown": get_markdown_str(config.root),
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
 @app.get("/auth/config")
 async def auth(request: Request):
     return get_configuration()
@@ -384,6 +509,7 @@ async def oauth_callback(
 
 @app.post("/completion")
 async def completion(
+    http_request: Request,
     request: CompletionRequest,
     current_user: Annotated[
         Union[AppUser, PersistedAppUser], Depends(get_current_user)
@@ -391,18 +517,31 @@ async def completion(
 ):
     """Handle a completion request from the prompt playground."""
 
-    providers = get_llm_providers()
+    if not request.prompt.provider:
+        raise HTTPException(status_code=422, detail="Missing LLM provider")
 
-    try:
-        provider = [p for p in providers if p.id == request.prompt.provider][0]
-    except IndexError:
+    provider = get_llm_provider(request.prompt.provider)
+
+    if not provider:
         raise HTTPException(
             status_code=404,
             detail=f"LLM provider '{request.prompt.provider}' not found",
         )
 
+    cache = get_completion_cache()
+    cache_key = get_cache_key(provider.id, request) if cache is not None else None
+
+    if cache is not None and cache_key and not is_cache_bypassed(http_request):
+        tokens = cache.get(cache_key)
+        if tokens is not None:
+            trace_event("pp_cached_completion")
+            return cached_completion_response(tokens)
+
     trace_event("pp_create_completion")
-    response = await provider.create_completion(request)
+    response = await create_limited_completion(provider, request)
+
+    if cache is not None and cache_key and isinstance(response, StreamingResponse):
+        response = cache_completion_response(cache, cache_key, response)
 
     return response
 
@@ -413,23 +552,42 @@ async def get_providers(
 ):
     """List the providers."""
     trace_event("pp_get_llm_providers")
-    providers = get_llm_providers()
-    providers = [p.to_dict() for p in providers]
-    return JSONResponse(content={"providers": providers})
+    return Response(
+        content=serialize_llm_providers(),
+        media_type="application/json",
+    )
 
 
 @app.get("/project/settings")
 async def project_settings(
-    current_user: Annotated[Union[AppUser, PersistedAppUser], Depends(get_current_user)]
+    request: Request,
+    current_user: Annotated[
+        Union[AppUser, PersistedAppUser], Depends(get_current_user)
+    ],
 ):
     """Return project settings. This is called by the UI before the establishing the websocket connection."""
-    return JSONResponse(
-        content={
-            "ui": config.ui.to_dict(),
-            "userEnv": config.project.user_env,
-            "dataPersistence": config.data_persistence,
-            "markdown": get_markdown_str(config.root),
-        }
+    return get_rendered_response(
+        "project_settings",
+        get_project_settings,
+        "application/json",
+        # chainlit.md can be edited without reloading the config
+        sources=[os.path.join(config.root, "chainlit.md")],
+    ).response(request.headers)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Serve the reply and persistence metrics in the Prometheus text format."""
+    if not config.project.metrics_endpoint:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    content = reply_metrics.to_prometheus()
+    if isinstance(chainlit_client, ResilientClient):
+        content += chainlit_client.to_prometheus()
+
+    return Response(
+        content=content,
+        media_type="text/plain; version=0.0.4",
     )
 
 
@@ -453,6 +611,8 @@ async def update_feedback(
         feedback=update.feedback,
         feedbackComment=update.feedbackComment,
     )
+    if current_user:
+        invalidate_conversations_cache(current_user.username)
     return JSONResponse(content={"success": True})
 
 
@@ -471,8 +631,30 @@ async def get_user_conversations(
         raise HTTPException(status_code=400, detail="Data persistence is not enabled")
 
     payload.filter.username = current_user.username
-    res = await chainlit_client.get_conversations(payload.pagination, payload.filter)
-    return JSONResponse(content=res.to_dict())
+
+    cache_key = (
+        current_user.username,
+        payload.pagination.json(),
+        payload.filter.json(),
+    )
+    if (content := conversations_cache.get(cache_key)) is None:
+        res = await chainlit_client.get_conversations(
+            payload.pagination, payload.filter
+        )
+        content = res.to_dict()
+        conversations_cache.set(cache_key, content)
+
+    return JSONResponse(content=content)
+
+
+def sign_element_urls(elements: List[ElementDict], username: str) -> List[Dict]:
+    """Copy the elements with their content urls signed for the user."""
+    return [
+        {**element, "url": sign_url(element["url"], username)}
+        if element.get("url")
+        else dict(element)
+        for element in elements
+    ]
 
 
 @app.get("/project/conversation/{conversation_id}")
@@ -482,16 +664,70 @@ async def get_conversation(
     current_user: Annotated[
         Union[AppUser, PersistedAppUser], Depends(get_current_user)
     ],
+    first: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get a specific conversation. If first is set, only the latest messages are returned."""
+
+    if not chainlit_client:
+        raise HTTPException(status_code=400, detail="Data persistence is not enabled")
+
+    await is_conversation_author(current_user.username, conversation_id)
+
+    res = await chainlit_client.get_conversation(conversation_id, first=first)
+    content = dict(res)
+    if res.get("elements"):
+        content["elements"] = sign_element_urls(
+            res["elements"] or [], current_user.username
+        )
+    return JSONResponse(content=content)
+
+
+@app.get("/project/conversation/{conversation_id}/messages")
+async def get_conversation_messages(
+    conversation_id: str,
+    current_user: Annotated[
+        Union[AppUser, PersistedAppUser], Depends(get_current_user)
+    ],
+    first: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    latest: bool = True,
 ):
-    """Get a specific conversation."""
+    """Get the messages of a conversation page by page, the latest ones first by default."""
 
     if not chainlit_client:
         raise HTTPException(status_code=400, detail="Data persistence is not enabled")
 
     await is_conversation_author(current_user.username, conversation_id)
 
-    res = await chainlit_client.get_conversation(conversation_id)
-    return JSONResponse(content=res)
+    res = await chainlit_client.get_messages(
+        conversation_id, Pagination(first=first, cursor=cursor), latest_first=latest
+    )
+    return JSONResponse(content=res.to_dict())
+
+
+@app.get("/project/conversation/{conversation_id}/elements")
+async def get_conversation_elements(
+    conversation_id: str,
+    current_user: Annotated[
+        Union[AppUser, PersistedAppUser], Depends(get_current_user)
+    ],
+    first: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    for_ids: Optional[List[str]] = Query(None, alias="forIds"),
+):
+    """Get the elements of a conversation page by page, optionally only the ones of the given messages."""
+
+    if not chainlit_client:
+        raise HTTPException(status_code=400, detail="Data persistence is not enabled")
+
+    await is_conversation_author(current_user.username, conversation_id)
+
+    res = await chainlit_client.get_elements(
+        conversation_id, Pagination(first=first, cursor=cursor), for_ids=for_ids
+    )
+    content = res.to_dict()
+    content["data"] = sign_element_urls(res.data, current_user.username)
+    return JSONResponse(content=content)
 
 
 @app.get("/project/conversation/{conversation_id}/element/{element_id}")
@@ -511,7 +747,8 @@ async def get_conversation_element(
     await is_conversation_author(current_user.username, conversation_id)
 
     res = await chainlit_client.get_element(conversation_id, element_id)
-    return JSONResponse(content=res)
+    content = sign_element_urls([res], current_user.username)[0] if res else None
+    return JSONResponse(content=content)
 
 
 @app.delete("/project/conversation")
@@ -532,16 +769,21 @@ async def delete_conversation(
     await is_conversation_author(current_user.username, conversation_id)
 
     await chainlit_client.delete_conversation(conversation_id)
+    invalidate_conversations_cache(current_user.username)
     return JSONResponse(content={"success": True})
 
 
 @app.get("/files/{filename:path}")
 async def serve_file(
+    request: Request,
     filename: str,
-    current_user: Annotated[
-        Union[AppUser, PersistedAppUser], Depends(get_current_user)
-    ],
+    username: Annotated[Optional[str], Depends(get_url_username)],
 ):
+    """Serve an element file of the local database to the author of its conversation."""
+    # Files are stored under the id of their conversation
+    if username:
+        await is_conversation_author(username, filename.split("/")[0])
+
     base_path = Path(config.project.local_fs_path).resolve()
     file_path = (base_path / filename).resolve()
 
@@ -550,64 +792,78 @@ async def serve_file(
         raise HTTPException(status_code=400, detail="Invalid filename")
 
     if file_path.is_file():
-        return FileResponse(file_path)
+        # Uploaded files are stored under a unique key and never modified
+        return await serve_static_file(
+            request, str(file_path), cache_control="private, max-age=31536000"
+        )
     else:
         raise HTTPException(status_code=404, detail="File not found")
 
 
-@app.get("/favicon")
-async def get_favicon():
-    custom_favicon_path = os.path.join(APP_ROOT, "public", "favicon.*")
-    files = glob.glob(custom_favicon_path)
+@app.get(f"{ELEMENT_STORE_ROUTE}/{{key}}")
+async def serve_element(
+    request: Request,
+    key: str,
+    username: Annotated[Optional[str], Depends(get_url_username)],
+):
+    """Serve the content of an element too large to be sent through the websocket."""
+    # Only served to the user of the sessions the element was sent to
+    entry = element_store.get(key, username)
+    if not entry or not os.path.isfile(entry[0]):
+        raise HTTPException(status_code=404, detail="Element not found")
+
+    file_path, media_type = entry
+    return await serve_static_file(
+        request,
+        file_path,
+        media_type=media_type,
+        # Contents are stored under their hash, files can change on disk
+        cache_control="private, max-age=31536000, immutable"
+        if element_store.is_immutable(key)
+        else "private, no-cache",
+    )
 
-    if files:
-        favicon_path = files[0]
-    else:
-        favicon_path = os.path.join(build_dir, "favicon.svg")
+
+@app.get("/favicon")
+async def get_favicon(request: Request):
+    favicon_path = public_assets.favicon
+    if not favicon_path:
+        raise HTTPException(status_code=404, detail="Missing favicon")
 
     media_type, _ = mimetypes.guess_type(favicon_path)
 
-    return FileResponse(favicon_path, media_type=media_type)
+    return await serve_static_file(
+        request,
+        favicon_path,
+        media_type=media_type,
+        cache_control=REVALIDATE_CACHE_CONTROL,
+    )
 
 
 @app.get("/logo")
-async def get_logo(theme: Optional[Theme] = Query(Theme.light)):
+async def get_logo(request: Request, theme: Optional[Theme] = Query(Theme.light)):
     theme_value = theme.value if theme else Theme.light.value
-    logo_path = None
-
-    public_path = os.path.join(APP_ROOT, "public", f"logo_{theme_value}.*")
-    assets_path = os.path.join(build_dir, "assets", f"logo_{theme_value}*.*")
-    print("public_path", public_path)
-    print("assets_path", assets_path)
-    for path in [
-        public_path,
-        assets_path,
-    ]:
-        files = glob.glob(path)
-
-        if files:
-            logo_path = files[0]
-            break
+    logo_path = public_assets.logos.get(theme_value)
 
     if not logo_path:
         raise HTTPException(
-            status_code=404, detail=f"Missing default logo: {logo_path}"
+            status_code=404, detail=f"Missing default logo: {theme_value}"
         )
     media_type, _ = mimetypes.guess_type(logo_path)
 
-    return FileResponse(logo_path, media_type=media_type)
+    return await serve_static_file(
+        request,
+        logo_path,
+        media_type=media_type,
+        cache_control=REVALIDATE_CACHE_CONTROL,
+    )
 
 
 def register_wildcard_route_handler():
     @app.get("/{path:path}")
     async def serve(request: Request, path: str):
-        html_template = get_html_template()
         """Serve the UI files."""
-        response = HTMLResponse(content=html_template, status_code=200)
-
-        print("build_dir", build_dir)
-
-        return response
+        return get_html_shell().response(request.headers)
 
 
 import chainlit.socket  # noqa
@@ -1,11 +1,16 @@
 import asyncio
+import uuid
+import weakref
 from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Union
 
 if TYPE_CHECKING:
     from chainlit.message import Message
     from chainlit.types import AskResponse
 
+from chainlit.cache import invalidate_conversations_cache
 from chainlit.client.cloud import AppUser, PersistedAppUser, chainlit_client
+from chainlit.element_store import element_store
+from chainlit.metrics import reply_metrics
 
 
 class BaseSession:
@@ -31,6 +36,7 @@ class BaseSession:
 
         self.id = id
         self.conversation_id: Optional[str] = None
+        self.conversation_task: Optional["asyncio.Future[Optional[str]]"] = None
 
         self.chat_settings: Dict[str, Any] = {}
 
@@ -40,22 +46,59 @@ class BaseSession:
         if not chainlit_client:
             return None
 
+        if self.conversation_id:
+            return self.conversation_id
+
         if isinstance(self, HTTPSession):
             tags = ["api"]
         else:
             tags = ["chat"]
 
-        if not self.conversation_id:
-            async with self.lock:
-                app_user_id = (
-                    self.user.id if isinstance(self.user, PersistedAppUser) else None
-                )
-                self.conversation_id = await chainlit_client.create_conversation(
-                    app_user_id=app_user_id, tags=tags
+        app_user_id = self.user.id if isinstance(self.user, PersistedAppUser) else None
+
+        if chainlit_client.lazy_conversations:
+            # No round-trip, the conversation is persisted along with its first message
+            self.conversation_id = str(uuid.uuid4())
+            chainlit_client.register_conversation(
+                self.conversation_id, app_user_id=app_user_id, tags=tags
+            )
+            if isinstance(self, HTTPSession):
+                # HTTP sessions are not deleted, they end with their request context
+                weakref.finalize(
+                    self, chainlit_client.unregister_conversation, self.conversation_id
                 )
-
+            return self.conversation_id
+
+        # Concurrent callers share the same creation request
+        if not self.conversation_task:
+            self.conversation_task = asyncio.ensure_future(
+                chainlit_client.create_conversation(app_user_id=app_user_id, tags=tags)
+            )
+
+        try:
+            self.conversation_id = await asyncio.shield(self.conversation_task)
+        finally:
+            if not self.conversation_id:
+                # Let the next call retry
+                self.conversation_task = None
+
+        self.invalidate_conversations_cache()
         return self.conversation_id
 
+    def invalidate_conversations_cache(self):
+        """Drop the cached history pages of the user once a write changed them."""
+        invalidate_conversations_cache(self.user.username if self.user else None)
+
+    def delete(self):
+        """Delete the session."""
+        if (
+            chainlit_client
+            and chainlit_client.lazy_conversations
+            and self.conversation_id
+        ):
+            # Conversations without any write are never persisted
+            chainlit_client.unregister_conversation(self.conversation_id)
+
 
 class HTTPSession(BaseSession):
     """Internal HTTP session object. Used to consume Chainlit through API (no websocket)."""
@@ -134,6 +177,9 @@ class WebsocketSession(BaseSession):
         """Delete the session."""
         ws_sessions_sid.pop(self.socket_id, None)
         ws_sessions_id.pop(self.id, None)
+        reply_metrics.remove_session(self.id)
+        element_store.release_session(self.id)
+        super().delete()
 
     @classmethod
     def get(cls, socket_id: str):
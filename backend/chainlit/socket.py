@@ -1,6 +1,7 @@
 import asyncio
 import json
-from typing import Any, Dict
+import time
+from typing import Any, Dict, Optional
 
 from chainlit.action import Action
 from chainlit.auth import get_current_user, require_login
@@ -9,16 +10,17 @@ from chainlit.config import config
 from chainlit.context import init_ws_context
 from chainlit.logger import logger
 from chainlit.message import ErrorMessage, Message
-from chainlit.server import socket
-from chainlit.session import WebsocketSession
-from chainlit.telemetry import trace_event
-from chainlit.user_session import user_sessions
-
+from chainlit.metrics import reply_metrics
 from chainlit.onepoint.user_tracker import (
+    TrackerOperations,
     track_message,
     track_message_dict,
-    TrackerOperations,
 )
+from chainlit.server import socket
+from chainlit.session import WebsocketSession
+from chainlit.telemetry import trace_event
+from chainlit.tracing import start_span, trace_emit
+from chainlit.user_session import user_sessions
 
 
 def restore_existing_session(sid, session_id, emit_fn, ask_user_fn):
@@ -71,7 +73,8 @@ async def connect(sid, environ, auth):
             if session.should_stop:
                 session.should_stop = False
                 raise InterruptedError("Task stopped by user")
-        return socket.emit(event, data, to=sid)
+            reply_metrics.record_emit(session.id, event)
+        return trace_emit(event, socket.emit(event, data, to=sid))
 
     # Function to ask the user a question
     def ask_user_fn(data, timeout):
@@ -183,30 +186,41 @@ async def stop(sid):
             await config.code.on_stop()
 
 
-async def process_message(session: WebsocketSession, message_dict: MessageDict):
+async def process_message(
+    session: WebsocketSession,
+    message_dict: MessageDict,
+    received_at: Optional[float] = None,
+):
     """Process a message from the user."""
-    try:
-        context = init_ws_context(session)
-
-        await context.emitter.task_start()
-        if config.code.on_message:
-            await context.emitter.process_user_message(message_dict)
-            message = Message.from_dict(message_dict)
-            await config.code.on_message(message.content.strip(), message.id)
-    except InterruptedError:
-        pass
-    except Exception as e:
-        logger.exception(e)
-        await ErrorMessage(
-            author="Error", content=str(e) or e.__class__.__name__
-        ).send()
-    finally:
-        await context.emitter.task_end()
+    context = init_ws_context(session)
+    reply = reply_metrics.start_reply(session.id, received_at)
+    with start_span(
+        "process_message", {"chainlit.message.id": message_dict.get("id", "")}
+    ):
+        try:
+            await context.emitter.task_start()
+            if config.code.on_message:
+                await context.emitter.process_user_message(message_dict)
+                message = Message.from_dict(message_dict)
+                with start_span("on_message", {"chainlit.message.id": message.id}):
+                    reply.started_at = time.monotonic()
+                    await config.code.on_message(message.content.strip(), message.id)
+        except InterruptedError:
+            pass
+        except Exception as e:
+            logger.exception(e)
+            await ErrorMessage(
+                author="Error", content=str(e) or e.__class__.__name__
+            ).send()
+        finally:
+            reply_metrics.end_reply(session.id, reply)
+            await context.emitter.task_end()
 
 
 @socket.on("ui_message")
 async def message(sid, message):
     """Handle a message sent by the User."""
+    received_at = time.monotonic()
 
     # Changed by Onepoint
     user_id = message.get("onepointId", "")
@@ -215,7 +229,7 @@ async def message(sid, message):
     session = WebsocketSession.require(sid)
     session.should_stop = False
 
-    await process_message(session, message)
+    await process_message(session, message, received_at)
 
 
 async def process_action(action: Action):
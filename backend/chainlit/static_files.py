@@ -0,0 +1,487 @@
+import asyncio
+import glob
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiofiles
+from asyncer import asyncify
+from chainlit.logger import logger
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.staticfiles import PathLike
+from starlette.types import Scope
+
+# Size of the chunks ranged responses are streamed by
+RANGE_CHUNK_SIZE = 64 * 1024
+
+# The built assets have a content hash in their name, e.g. index-3f2a1b9c.js
+HASHED_ASSET_REGEX = re.compile(r"-[0-9a-zA-Z_-]{8}\.\w+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Cached but revalidated with the ETag before being used
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Supported content encodings, by order of preference
+CONTENT_ENCODINGS = ["br", "gzip"]
+
+# File extensions of the encoded siblings of the precompressed assets
+ENCODING_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+# Assets worth compressing, the others (images, fonts) already are
+COMPRESSIBLE_EXTENSIONS = [".js", ".css", ".html", ".svg", ".json", ".map", ".txt"]
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Modification time and size of a file, None if it does not exist."""
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def is_fresh(path: str, source_stat: os.stat_result) -> bool:
+    """Whether an encoded file exists and is not older than its source."""
+    try:
+        return os.stat(path).st_mtime_ns >= source_stat.st_mtime_ns
+    except OSError:
+        return False
+
+
+def get_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header, weak validators match too."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes" Range header into inclusive (start, end) offsets.
+    Return None if the range can not be satisfied.
+    Raise ValueError if the header is malformed or asks for several ranges,
+    in which case the whole file is served.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        raise ValueError("Unsupported range")
+
+    first, _, last = ranges.strip().partition("-")
+    if not first:
+        # Suffix range, the last n bytes
+        suffix = int(last)
+        if suffix <= 0:
+            return None
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, min(end, size - 1)
+
+
+async def iter_file_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(
+    request_headers: Headers,
+    path: str,
+    stat_result: os.stat_result,
+    media_type: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    status_code: int = 200,
+    method: Optional[str] = None,
+) -> Response:
+    """
+    Build the response for a file with an ETag, answering conditional requests
+    with a 304 and Range requests with a 206 partial content.
+    """
+    etag = get_etag(stat_result)
+    response_headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+        **(headers or {}),
+    }
+    if cache_control:
+        response_headers["cache-control"] = cache_control
+
+    if status_code == 200 and etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=response_headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    # A stale If-Range validator means the whole file must be sent again
+    if status_code == 200 and range_header and (not if_range or if_range == etag):
+        size = stat_result.st_size
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            pass
+        else:
+            if byte_range is None:
+                return Response(
+                    status_code=416,
+                    headers={**response_headers, "content-range": f"bytes */{size}"},
+                )
+            start, end = byte_range
+            response_headers["content-range"] = f"bytes {start}-{end}/{size}"
+            response_headers["content-length"] = str(end - start + 1)
+            return StreamingResponse(
+                iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type or guess_media_type(path),
+                headers=response_headers,
+            )
+
+    return FileResponse(
+        path,
+        status_code=status_code,
+        media_type=media_type,
+        headers=response_headers,
+        stat_result=stat_result,
+        method=method,
+    )
+
+
+async def serve_static_file(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    stat_result = await asyncify(os.stat)(path)
+    return file_response(
+        request.headers,
+        path,
+        stat_result,
+        media_type=media_type,
+        cache_control=cache_control,
+        headers=headers,
+        method=request.method,
+    )
+
+
+def guess_media_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "text/plain"
+
+
+def is_hashed_asset(path: str) -> bool:
+    return HASHED_ASSET_REGEX.search(os.path.basename(path)) is not None
+
+
+class AssetFiles(StaticFiles):
+    """
+    Static files with range support, revalidated with their ETag. With
+    hashed_assets, the files with a content hash in their name (the built
+    assets) never change and are cached for good.
+    Once precompress() ran, compressible assets are served from a .br or .gz
+    encoded file according to the Accept-Encoding header of the request. The
+    encoded files shipped along with the assets are used if up to date, the
+    other ones are written to cache_dir, never next to the (installed) assets.
+    """
+
+    def __init__(
+        self,
+        *args,
+        hashed_assets: bool = False,
+        cache_dir: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.hashed_assets = hashed_assets
+        self.cache_dir = cache_dir
+        # Asset paths to their source mtime and size and encoded siblings, by encoding
+        self.encoded = (
+            {}
+        )  # type: Dict[str, Tuple[Tuple[int, int], Dict[str, Tuple[str, os.stat_result]]]]
+        # Changed assets being compressed again
+        self.refreshing = set()  # type: Set[str]
+
+    def precompress(self):
+        """Find or write the encoded files of the compressible assets."""
+        encodings = available_encodings()
+        for directory in self.all_directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                        self._precompress_file(os.path.join(root, name), encodings)
+
+    def _cache_path(self, path: str, encoding: str) -> str:
+        # Keyed by the asset path, the mounted directories share the cache
+        key = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+        name = f"{key}-{os.path.basename(path)}{ENCODING_EXTENSIONS[encoding]}"
+        return os.path.join(self.cache_dir or "", name)
+
+    def _precompress_file(self, path: str, encodings: List[str]):
+        source_stat = os.stat(path)
+        siblings = {}  # type: Dict[str, Tuple[str, os.stat_result]]
+        content = None  # type: Optional[bytes]
+        for encoding in encodings:
+            # Generated along with the build
+            sibling_path = path + ENCODING_EXTENSIONS[encoding]
+            try:
+                if not is_fresh(sibling_path, source_stat):
+                    if not self.cache_dir:
+                        continue
+                    sibling_path = self._cache_path(path, encoding)
+                if not is_fresh(sibling_path, source_stat):
+                    if content is None:
+                        with open(path, "rb") as f:
+                            content = f.read()
+                    compressed = compress(content, encoding)
+                    if compressed is None or len(compressed) >= len(content):
+                        continue
+                    os.makedirs(os.path.dirname(sibling_path), exist_ok=True)
+                    tmp_path = f"{sibling_path}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, sibling_path)
+                siblings[encoding] = (sibling_path, os.stat(sibling_path))
+            except OSError as e:
+                logger.debug(f"Could not precompress {path}: {e}")
+        if siblings:
+            self.encoded[path] = (
+                (source_stat.st_mtime_ns, source_stat.st_size),
+                siblings,
+            )
+        else:
+            self.encoded.pop(path, None)
+
+    def _refresh(self, path: str):
+        """Compress a changed asset again in the background, served as is meanwhile."""
+        if path in self.refreshing:
+            return
+        self.refreshing.add(path)
+
+        def precompress_file():
+            try:
+                self._precompress_file(path, available_encodings())
+            finally:
+                self.refreshing.discard(path)
+
+        try:
+            asyncio.get_running_loop().run_in_executor(None, precompress_file)
+        except RuntimeError:
+            self.refreshing.discard(path)
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        path = str(full_path)
+        request_headers = Headers(scope=scope)
+        cache_control = (
+            IMMUTABLE_CACHE_CONTROL
+            if self.hashed_assets and is_hashed_asset(path)
+            else REVALIDATE_CACHE_CONTROL
+        )
+
+        encoded = self.encoded.get(path)
+        if encoded and encoded[0] != (stat_result.st_mtime_ns, stat_result.st_size):
+            self._refresh(path)
+            encoded = None
+        if not encoded:
+            return file_response(
+                request_headers,
+                path,
+                stat_result,
+                cache_control=cache_control,
+                status_code=status_code,
+                method=scope["method"],
+            )
+
+        headers = {"vary": "Accept-Encoding"}
+        siblings = encoded[1]
+        encoding = negotiate_encoding(request_headers.get("accept-encoding"), siblings)
+        # Ranges apply to the identity representation
+        if not encoding or "range" in request_headers:
+            return file_response(
+                request_headers,
+                path,
+                stat_result,
+                cache_control=cache_control,
+                headers=headers,
+                status_code=status_code,
+                method=scope["method"],
+            )
+
+        sibling_path, sibling_stat = siblings[encoding]
+        headers["content-encoding"] = encoding
+        return file_response(
+            request_headers,
+            sibling_path,
+            sibling_stat,
+            media_type=guess_media_type(path),
+            cache_control=cache_control,
+            headers=headers,
+            status_code=status_code,
+            method=scope["method"],
+        )
+
+
+class PublicAssets:
+    """
+    Paths of the favicon and logos, resolved once rather than on every request.
+    Custom files of the public directory take precedence over the built ones.
+    Call resolve() again when the public directory changes.
+    """
+
+    def __init__(self, public_dir: str, build_dir: str):
+        self.public_dir = public_dir
+        self.build_dir = build_dir
+        self.favicon = None  # type: Optional[str]
+        self.logos = {}  # type: Dict[str, Optional[str]]
+        self.resolve()
+
+    @staticmethod
+    def _first_match(*patterns: str) -> Optional[str]:
+        for pattern in patterns:
+            files = sorted(glob.glob(pattern))
+            if files:
+                return files[0]
+        return None
+
+    def resolve(self):
+        self.favicon = self._first_match(
+            os.path.join(self.public_dir, "favicon.*"),
+            os.path.join(self.build_dir, "favicon.svg"),
+        )
+        self.logos = {
+            theme: self._first_match(
+                os.path.join(self.public_dir, f"logo_{theme}.*"),
+                os.path.join(self.build_dir, "assets", f"logo_{theme}*.*"),
+            )
+            for theme in ["light", "dark"]
+        }
+
+
+def compress(content: bytes, encoding: str, fast: bool = False) -> Optional[bytes]:
+    """
+    Compress the content, return None if the encoding is not available.
+    Use fast for responses compressed on the fly rather than once.
+    """
+    if encoding == "gzip":
+        # A fixed mtime keeps the output deterministic
+        return gzip.compress(content, compresslevel=6 if fast else 9, mtime=0)
+    if encoding == "br":
+        try:
+            import brotli
+        except ImportError:
+            return None
+        return brotli.compress(content, quality=5 if fast else 11)
+    return None
+
+
+def available_encodings() -> List[str]:
+    return [
+        encoding
+        for encoding in CONTENT_ENCODINGS
+        if compress(b"", encoding, fast=True) is not None
+    ]
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str], available: Iterable[str]
+) -> Optional[str]:
+    """Pick the preferred available encoding accepted by the client, if any."""
+    if not accept_encoding:
+        return None
+
+    accepted = {}  # type: Dict[str, float]
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+
+    for encoding in CONTENT_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0))
+        if encoding in available and quality > 0:
+            return encoding
+    return None
+
+
+class PrecompressedContent:
+    """
+    In memory content rendered once, compressed once per encoding and
+    served with an ETag.
+    """
+
+    def __init__(self, content: bytes, media_type: str):
+        self.content = content
+        self.media_type = media_type
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+        self.variants = {}  # type: Dict[str, bytes]
+        for encoding in CONTENT_ENCODINGS:
+            compressed = compress(content, encoding)
+            if compressed is not None and len(compressed) < len(content):
+                self.variants[encoding] = compressed
+
+    def get_etag(self, encoding: Optional[str]) -> str:
+        # Each representation has its own strong validator
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+    def response(
+        self,
+        request_headers: Headers,
+        cache_control: Optional[str] = REVALIDATE_CACHE_CONTROL,
+        status_code: int = 200,
+    ) -> Response:
+        encoding = negotiate_encoding(
+            request_headers.get("accept-encoding"), self.variants
+        )
+        headers = {"etag": self.get_etag(encoding), "vary": "Accept-Encoding"}
+        if cache_control:
+            headers["cache-control"] = cache_control
+
+        if_none_match = request_headers.get("if-none-match")
+        if status_code == 200 and any(
+            etag_matches(if_none_match, self.get_etag(variant))
+            for variant in [None, *self.variants]
+        ):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["content-encoding"] = encoding
+            body = self.variants[encoding]
+        else:
+            body = self.content
+
+        return Response(
+            body, status_code=status_code, media_type=self.media_type, headers=headers
+        )
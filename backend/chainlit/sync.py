@@ -8,10 +8,11 @@ else:
 
 import asyncio
 import threading
+from typing import AsyncIterator, Callable, Iterable
 
 from asyncer import asyncify
-from syncer import sync
 from chainlit.context import context
+from syncer import sync
 
 make_async = asyncify
 
@@ -28,3 +29,48 @@ def run_sync(co: Coroutine[Any, Any, T_Retval]) -> T_Retval:
     else:  # Execute from a thread in the main event loop
         result = asyncio.run_coroutine_threadsafe(co, loop=context.loop)
         return result.result()
+
+
+async def iterate_in_thread(
+    iterable_factory: Callable[[], Iterable[T]]
+) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterable in a single worker thread and yield its items
+    as soon as they are produced, e.g. the token stream of a sync LLM SDK.
+    The iterable is created in the thread too, so blocking setup calls are fine.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()  # type: asyncio.Queue
+    stopped = threading.Event()
+    done = object()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The event loop is closed
+            stopped.set()
+
+    def produce():
+        try:
+            for item in iterable_factory():
+                if stopped.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(done, e)
+        else:
+            put(done)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is done:
+                if error:
+                    raise error
+                break
+            yield item
+    finally:
+        # The consumer went away, stop the thread at the next item
+        stopped.set()
@@ -1,37 +1,55 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
-    from opentelemetry.sdk.resources import Attributes, Resource
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
     from opentelemetry.trace import Tracer
 
 import hashlib
 import logging
+import threading
+from collections import Counter
 from functools import wraps
 from socket import gethostname
 
-import uptrace
 from chainlit.config import config
 from chainlit.version import __version__
 
+TELEMETRY_DSN = "https://YPa4AbDF853uCW6UWN2oYg@api.uptrace.dev/1778"
+TELEMETRY_ENDPOINT = "https://api.uptrace.dev:4317"
+
+# Share of the traces exported, decided when the root span starts
+SPAN_SAMPLE_RATE = 0.1
+# Interval (in seconds) at which the event counters are exported
+EXPORT_INTERVAL = 60
+# Maximum duration (in seconds) of an export, exports run in the background
+EXPORT_TIMEOUT = 5
+
 
 class ChainlitTelemetry:
-    def __init__(self):
-        self._tracer = None
+    """
+    Anonymous product telemetry. Events are aggregated in counters exported
+    periodically, only a sample of the traced functions are exported as spans.
+    Exports are batched and sent from background threads.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        # Read once, the telemetry is turned on or off with a restart
+        self.enabled = (
+            config.project.enable_telemetry if enabled is None else enabled
+        )  # type: bool
+        self._tracer = None  # type: Optional[Tracer]
+        self._tracer_provider = None  # type: Optional[TracerProvider]
+        self._meter_provider = None  # type: Optional[MeterProvider]
+        self._configure_thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+        self.counts = Counter()  # type: Counter[str]
 
-    # Patch uptrace.py to hash the hostname to avoid leaking it.
     @staticmethod
-    def _build_resource(
-        resource: "Resource",
-        resource_attributes: "Attributes",
-        service_name: str,
-        service_version: str,
-        deployment_environment: str,
-    ) -> "Resource":
+    def _build_resource() -> "Resource":
         from opentelemetry.sdk.resources import Resource
 
-        if resource:
-            return resource
-
         # If we are in production, use the URL as hostname
         if config.chainlit_prod_url:
             host_name = config.chainlit_prod_url
@@ -40,72 +58,136 @@ class ChainlitTelemetry:
             host_name = gethostname()
             host_name = hashlib.sha256(host_name.encode("UTF-8")).hexdigest()
 
-        attrs = {"host.name": host_name}
-
-        if resource_attributes:
-            attrs.update(resource_attributes)
-        if service_name:
-            attrs["service.name"] = service_name
-        if service_version:
-            attrs["service.version"] = service_version
-        if deployment_environment:
-            attrs["deployment.environment"] = deployment_environment
-
-        return Resource.create(attrs)
+        return Resource.create(
+            {
+                "host.name": host_name,
+                "service.name": "chainlit",
+                "service.version": __version__,
+                "deployment.environment": "production",
+            }
+        )
 
-    def configure_tracer(self):
+    def _configure(self):
+        import grpc
         from opentelemetry.exporter.otlp.proto.grpc.exporter import (
             logger as exporter_logger,
         )
-        from opentelemetry.trace import get_tracer
-
-        if self._tracer:
-            return self._tracer
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import (
+            OTLPMetricExporter,
+        )
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.metrics import CallbackOptions, Observation
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 
-        uptrace.uptrace._build_resource = self._build_resource
+        exporter_logger.setLevel(logging.CRITICAL)
 
-        uptrace.configure_opentelemetry(
-            dsn="https://YPa4AbDF853uCW6UWN2oYg@api.uptrace.dev/1778",
-            service_name="chainlit",
-            service_version="1.1.0",
-            deployment_environment="production",
-            logging_level=logging.CRITICAL,
+        resource = self._build_resource()
+        exporter_options = {
+            "endpoint": TELEMETRY_ENDPOINT,
+            "headers": (("uptrace-dsn", TELEMETRY_DSN),),
+            "timeout": EXPORT_TIMEOUT,
+            "compression": grpc.Compression.Gzip,
+        }
+
+        # Not registered globally, to leave the OpenTelemetry setup of the app alone
+        tracer_provider = TracerProvider(
+            resource=resource,
+            sampler=ParentBased(TraceIdRatioBased(SPAN_SAMPLE_RATE)),
+        )
+        tracer_provider.add_span_processor(
+            BatchSpanProcessor(
+                OTLPSpanExporter(**exporter_options),
+                max_queue_size=1000,
+                max_export_batch_size=1000,
+                schedule_delay_millis=EXPORT_INTERVAL * 1000,
+            )
         )
 
-        exporter_logger.setLevel(logging.CRITICAL)
+        def observe_counts(options: CallbackOptions):
+            with self._lock:
+                counts = list(self.counts.items())
+            return [Observation(count, {"event": event}) for event, count in counts]
+
+        meter_provider = MeterProvider(
+            resource=resource,
+            metric_readers=[
+                PeriodicExportingMetricReader(
+                    OTLPMetricExporter(**exporter_options),
+                    export_interval_millis=EXPORT_INTERVAL * 1000,
+                    export_timeout_millis=EXPORT_TIMEOUT * 1000,
+                )
+            ],
+        )
+        meter_provider.get_meter("chainlit", __version__).create_observable_counter(
+            "chainlit.events", callbacks=[observe_counts]
+        )
 
-        tracer = get_tracer("chainlit", __version__)
-        return tracer
+        self._tracer_provider = tracer_provider
+        self._meter_provider = meter_provider
+        self._tracer = tracer_provider.get_tracer("chainlit", __version__)
+
+    def _ensure_configured(self):
+        # The exporters are created in the background, nothing is lost
+        # meanwhile since the counts are kept from the start
+        if self._configure_thread is None:
+            with self._lock:
+                if self._configure_thread is None:
+                    self._configure_thread = threading.Thread(
+                        target=self._configure, daemon=True
+                    )
+                    self._configure_thread.start()
 
     @property
-    def tracer(self) -> "Tracer":
-        if self._tracer is None:
-            self._tracer = self.configure_tracer()
-
+    def tracer(self) -> Optional["Tracer"]:
+        """Tracer of the sampled spans, None until the exporters are ready."""
+        self._ensure_configured()
         return self._tracer
 
+    def record(self, event_name: str):
+        self._ensure_configured()
+        with self._lock:
+            self.counts[event_name] += 1
+
+    def shutdown(self):
+        """Export what is left, called when the server stops."""
+        try:
+            if self._tracer_provider:
+                self._tracer_provider.shutdown()
+            if self._meter_provider:
+                self._meter_provider.shutdown(timeout_millis=EXPORT_TIMEOUT * 1000)
+        except Exception:
+            pass
+
 
 chainlit_telemetry = ChainlitTelemetry()
 
 
-def trace_event(event_name):
-    if config.project.enable_telemetry:
-        with chainlit_telemetry.tracer.start_as_current_span(
-            event_name, record_exception=False, set_status_on_exception=False
-        ):
-            return
+def trace_event(event_name: str, subject: Optional[str] = None):
+    """Count an event, e.g. trace_event("init", "Message")."""
+    if chainlit_telemetry.enabled:
+        chainlit_telemetry.record(f"{event_name} {subject}" if subject else event_name)
 
 
 def trace(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        if config.project.enable_telemetry:
-            event_name = func.__name__
-            with chainlit_telemetry.tracer.start_as_current_span(
-                event_name, record_exception=False, set_status_on_exception=False
-            ):
-                return func(*args, **kwargs)
-        else:
+        if not chainlit_telemetry.enabled:
+            return func(*args, **kwargs)
+
+        event_name = func.__name__
+        chainlit_telemetry.record(event_name)
+        tracer = chainlit_telemetry.tracer
+        if tracer is None:
+            return func(*args, **kwargs)
+        with tracer.start_as_current_span(
+            event_name, record_exception=False, set_status_on_exception=False
+        ):
             return func(*args, **kwargs)
 
     return wrapper
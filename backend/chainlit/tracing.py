@@ -0,0 +1,190 @@
+"""
+OpenTelemetry tracing of the message pipeline, for the operators of the app.
+
+Unlike the anonymous telemetry, it is disabled by default and enabled with the
+[project.tracing] table of the config. The spans of a reply (process_message,
+on_message, persistence calls, element uploads, LLM runs and socket emits) are
+exported to an OTLP collector or written to a local file.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, Iterator, Optional
+
+from chainlit.config import TracingSettings, config, config_dir
+from chainlit.logger import logger
+from chainlit.version import __version__
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.trace import Span, Tracer
+
+DEFAULT_TRACES_FILE = os.path.join(config_dir, "traces.jsonl")
+
+_lock = threading.Lock()
+_settings = None  # type: Optional[TracingSettings]
+_provider = None  # type: Optional[TracerProvider]
+_tracer = None  # type: Optional[Tracer]
+
+
+def _build_exporter(settings: TracingSettings):
+    if settings.exporter == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        file_path = settings.file_path or DEFAULT_TRACES_FILE
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        return ConsoleSpanExporter(
+            out=open(file_path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    elif settings.protocol == "http/protobuf":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter as HTTPSpanExporter,
+        )
+
+        return HTTPSpanExporter(endpoint=settings.endpoint, headers=settings.headers)
+    else:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=settings.endpoint, headers=settings.headers)
+
+
+def _build_provider(settings: TracingSettings) -> "TracerProvider":
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create(
+            {
+                "service.name": settings.service_name,
+                "service.version": __version__,
+            }
+        ),
+        sampler=ParentBased(TraceIdRatioBased(settings.sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_build_exporter(settings)))
+    return provider
+
+
+def get_tracer() -> Optional["Tracer"]:
+    """Return the tracer of the pipeline, None if tracing is disabled."""
+    global _settings, _provider, _tracer
+
+    settings = config.project.tracing
+    if settings is None and _provider is None:
+        return None
+    if settings == _settings:
+        return _tracer
+
+    with _lock:
+        if settings != _settings:
+            # The config was reloaded
+            if _provider:
+                threading.Thread(target=_provider.shutdown, daemon=True).start()
+            _provider = _tracer = None
+            if settings:
+                try:
+                    _provider = _build_provider(settings)
+                    _tracer = _provider.get_tracer("chainlit", __version__)
+                except Exception as e:
+                    logger.error(f"Failed to configure tracing: {repr(e)}")
+            _settings = settings
+    return _tracer
+
+
+def shutdown_tracing():
+    """Export the pending spans, called when the server stops."""
+    if _provider:
+        _provider.shutdown()
+
+
+def _context_attributes() -> Dict[str, Any]:
+    from chainlit.context import context_var
+
+    attributes = {}  # type: Dict[str, Any]
+    if context := context_var.get(None):
+        attributes["chainlit.session.id"] = context.session.id
+        if context.session.conversation_id:
+            attributes["chainlit.conversation.id"] = context.session.conversation_id
+    return attributes
+
+
+@contextmanager
+def start_span(
+    name: str, attributes: Optional[Dict[str, Any]] = None
+) -> Iterator[Optional["Span"]]:
+    """Trace a block of code, with the session and conversation of the context."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+
+    with tracer.start_as_current_span(
+        name, attributes={**_context_attributes(), **(attributes or {})}
+    ) as span:
+        yield span
+
+
+def trace_emit(event: str, emit: Awaitable) -> Awaitable:
+    """Trace a socket emit, returned as is if tracing is disabled."""
+    if get_tracer() is None:
+        return emit
+
+    async def traced_emit():
+        with start_span(f"emit {event}", {"chainlit.event": event}):
+            return await emit
+
+    return traced_emit()
+
+
+class RunSpans:
+    """
+    Spans of runs started and ended by different callbacks, like the LLM runs
+    of the LangChain and LlamaIndex callback handlers.
+    """
+
+    def __init__(self):
+        self.spans = {}  # type: Dict[Any, Span]
+
+    def start(
+        self,
+        run_id: Any,
+        name: str,
+        parent_run_id: Any = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        tracer = get_tracer()
+        if tracer is None or run_id is None:
+            return
+
+        from opentelemetry.trace import set_span_in_context
+
+        parent = self.spans.get(parent_run_id) if parent_run_id else None
+        self.spans[run_id] = tracer.start_span(
+            name,
+            context=set_span_in_context(parent) if parent else None,
+            attributes={**_context_attributes(), **(attributes or {})},
+        )
+
+    def end(
+        self,
+        run_id: Any,
+        error: Optional[BaseException] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        span = self.spans.pop(run_id, None)
+        if span is None:
+            return
+
+        if attributes:
+            span.set_attributes(attributes)
+        if error is not None:
+            from opentelemetry.trace import Status, StatusCode
+
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
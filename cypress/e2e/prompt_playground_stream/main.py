@@ -0,0 +1,48 @@
+import os
+
+import chainlit as cl
+from chainlit.input_widget import Select
+from chainlit.playground.config import BaseProvider, add_llm_provider
+from chainlit.prompt import Prompt
+
+os.environ["TEST_LLM_API_KEY"] = "sk..."
+
+
+class StreamTestLLMProvider(BaseProvider):
+    async def stream_completion(self, request):
+        self.create_prompt(request)
+        self.require_settings(request.prompt.settings)
+
+        for token in ["This ", "is ", "the ", "streamed ", "completion"]:
+            await cl.sleep(0.1)
+            yield token
+
+
+StreamTestLLM = StreamTestLLMProvider(
+    id="test-stream",
+    name="TestStream",
+    env_vars={"api_key": "TEST_LLM_API_KEY"},
+    inputs=[
+        Select(
+            id="model",
+            label="Model",
+            values=["test-model-1", "test-model-2"],
+            initial_value="test-model-1",
+        ),
+    ],
+    is_chat=False,
+)
+
+add_llm_provider(StreamTestLLM)
+
+
+@cl.on_chat_start
+async def start():
+    await cl.Message(
+        content="This is a message with a streamed prompt",
+        prompt=Prompt(
+            provider=StreamTestLLM.id,
+            completion="This is the original completion",
+            formatted="This is a test formatted prompt",
+        ),
+    ).send()
@@ -0,0 +1,22 @@
+import { runTestServer } from '../../support/testUtils';
+
+describe('PromptPlayground stream_completion', () => {
+  before(() => {
+    runTestServer();
+  });
+
+  beforeEach(() => {
+    cy.visit('/');
+    cy.get('.playground-button').eq(0).should('exist').click();
+  });
+
+  it('should stream the tokens of the provider stream_completion', () => {
+    // Wait for the llm provider
+    cy.wait(1000);
+    cy.get('#submit-prompt').should('exist').click();
+    cy.get('.completion-editor [contenteditable]').should(
+      'contain',
+      'This is the streamed completion'
+    );
+  });
+});
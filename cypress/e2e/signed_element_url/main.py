@@ -0,0 +1,25 @@
+import os
+from typing import Optional
+
+import chainlit as cl
+
+# Larger than the websocket limit, served from its url
+IMAGE_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "global_elements", "cat.jpeg"
+)
+
+
+@cl.password_auth_callback
+def auth_callback(username: str, password: str) -> Optional[cl.AppUser]:
+    if (username, password) == ("admin", "admin"):
+        return cl.AppUser(username="admin", role="ADMIN", provider="credentials")
+    else:
+        return None
+
+
+@cl.on_chat_start
+async def on_chat_start():
+    await cl.Message(
+        "Here is a large image",
+        elements=[cl.Image(path=IMAGE_PATH, name="image1", display="inline")],
+    ).send()
@@ -0,0 +1,32 @@
+import { runTestServer } from '../../support/testUtils';
+
+describe('Signed element url', () => {
+  before(() => {
+    runTestServer();
+  });
+
+  it('should load large elements without the Authorization header', () => {
+    cy.get("input[name='email']").type('admin');
+    cy.get("input[name='password']").type('admin');
+    cy.get("button[type='submit']").click();
+
+    cy.get('.message')
+      .eq(0)
+      .find('.inline-image')
+      .should('have.attr', 'src')
+      .and('contain', '/elements/')
+      .and('contain', 'token=')
+      .then((src) => {
+        // Fetched like the img tag does, with no headers
+        cy.request({ url: String(src), headers: {} })
+          .its('status')
+          .should('eq', 200);
+        cy.request({
+          url: String(src).split('?')[0],
+          failOnStatusCode: false
+        })
+          .its('status')
+          .should('eq', 401);
+      });
+  });
+});